@@ -0,0 +1,136 @@
+import random
+
+# API v1 hosts the older venues, API v2 the newer ones, as on OpenReview
+V1_VENUES = [
+    "ICLR.cc/2020/Conference",
+    "ICLR.cc/2021/Conference",
+    "NeurIPS.cc/2021/Conference",
+]
+V2_VENUES = [
+    "ICLR.cc/2024/Conference",
+    "NeurIPS.cc/2023/Conference",
+    "ICML.cc/2024/Conference",
+]
+
+TOPICS = [
+    "large language model",
+    "reinforcement learning",
+    "multi-agent reinforcement learning",
+    "game theory",
+    "nash equilibrium",
+    "graph neural network",
+    "diffusion model",
+    "contrastive learning",
+    "federated learning",
+    "vision transformer",
+    "in-context learning",
+    "mechanism design",
+    "offline reinforcement learning",
+    "causal inference",
+    "bayesian optimization",
+    "neural architecture search",
+    "adversarial robustness",
+    "representation learning",
+    "instruction tuning",
+    "self-supervised learning",
+]
+WORDS = (
+    "we propose novel method approach framework analysis model training data "
+    "learning efficient scalable robust theoretical empirical results show "
+    "improves performance benchmark tasks across datasets state art baseline "
+    "experiments demonstrate problem setting algorithm optimization objective "
+    "loss function gradient convergence guarantee bound sample complexity "
+    "generalization evaluation study task agents policy reward environment "
+    "structure attention layer network parameters inference time memory cost "
+    "simple effective general limited existing prior work recent advances"
+).split()
+FIRST_NAMES = ["Alice", "Bob", "Chen", "Dana", "Elif", "Farid", "Grace", "Hiro"]
+LAST_NAMES = ["Smith", "Wang", "Garcia", "Kim", "Müller", "Rossi", "Singh", "Ivanova"]
+
+
+def sentence(rng, n_words, topic_prob=0.15):
+    words = []
+    while len(words) < n_words:
+        if rng.random() < topic_prob:
+            words += rng.choice(TOPICS).split()
+        else:
+            words.append(rng.choice(WORDS))
+    return " ".join(words).capitalize() + "."
+
+
+def paper_fields(rng):
+    title = sentence(rng, rng.randint(6, 12), topic_prob=0.3)[:-1].title()
+    abstract = " ".join(
+        sentence(rng, rng.randint(15, 25)) for _ in range(rng.randint(6, 10))
+    )
+    keywords = rng.sample(TOPICS, rng.randint(3, 6))
+    authors = [
+        f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        for _ in range(rng.randint(1, 6))
+    ]
+    return title, abstract, keywords, authors
+
+
+def make_note(rng, idx, venue, api_version):
+    """
+    A submission note as the API returns it: v1 notes have plain content
+    values, v2 notes wrap every content value in {"value": ...}.
+    """
+    note_id = f"{idx:010x}"
+    title, abstract, keywords, authors = paper_fields(rng)
+    tmdate = 1_600_000_000_000 + idx * 1000
+    content = {
+        "title": title,
+        "abstract": abstract,
+        "keywords": keywords,
+        "authors": authors,
+        "authorids": [f"~{author.replace(' ', '_')}1" for author in authors],
+        "pdf": f"/pdf/{note_id}.pdf",
+        "venue": venue.split("/")[0],
+        "venueid": venue,
+    }
+    replies = [
+        {"id": f"{note_id}r{i}", "content": {"review": sentence(rng, 40)}}
+        for i in range(rng.randint(0, 4))
+    ]
+    note = {
+        "id": note_id,
+        "forum": note_id,
+        "number": idx + 1,
+        "tcdate": tmdate,
+        "tmdate": tmdate,
+        "cdate": tmdate,
+        "readers": ["everyone"],
+        "writers": [venue],
+        "signatures": [f"{venue}/Authors"],
+        "_replies": replies,
+    }
+    if api_version == 1:
+        note["invitation"] = f"{venue}/-/Blind_Submission"
+        note["content"] = content
+    else:
+        note["invitations"] = [f"{venue}/-/Submission"]
+        note["domain"] = venue
+        note["content"] = {key: {"value": value} for key, value in content.items()}
+    return note
+
+
+def make_corpus(n_notes, seed=0):
+    """
+    Deterministic synthetic corpus of n_notes submissions spread round-robin
+    over the V1_VENUES and V2_VENUES.
+
+    Returns:
+      Dictionary {1: [v1 notes], 2: [v2 notes]}, each sorted by id
+    """
+    rng = random.Random(seed)
+    venues = [(venue, 1) for venue in V1_VENUES] + [(venue, 2) for venue in V2_VENUES]
+    corpus = {1: [], 2: []}
+    for idx in range(n_notes):
+        venue, api_version = venues[idx % len(venues)]
+        corpus[api_version].append(make_note(rng, idx, venue, api_version))
+    return corpus
+
+
+def strip_private(note):
+    return {key: value for key, value in note.items() if not key.startswith("_")}
@@ -0,0 +1,181 @@
+import bisect
+import json
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from bench.corpus import strip_private
+
+
+class RateLimiter:
+    """
+    Non-blocking token bucket: `take` returns 0 if a request may proceed, or
+    the seconds until it may, which the server sends as Retry-After with 429.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self):
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+
+class MockOpenReview(ThreadingHTTPServer):
+    """
+    Local stand-in for one OpenReview API host, serving a synthetic corpus
+    through the endpoints the scraper uses: /notes (filtering by venueid,
+    invitation, id or forum; id cursor, offset and limit paging; details),
+    /notes/search and /groups?id=venues.
+
+    Args:
+      notes: Notes of one API version (see bench.corpus.make_corpus)
+      venues: Members of the `venues` group
+      latency: Seconds added to every response
+      rate: Requests per second allowed before answering 429, None for no limit
+      port: Port to listen on, 0 for any free port
+    """
+
+    daemon_threads = True
+
+    def __init__(self, notes, venues, latency=0.0, rate=None, port=0):
+        super().__init__(("127.0.0.1", port), MockHandler)
+        self.notes = sorted(notes, key=lambda note: note["id"])
+        self.ids = [note["id"] for note in self.notes]
+        self.venues = venues
+        self.latency = latency
+        self.limiter = RateLimiter(rate) if rate else None
+        self.n_requests = 0
+        self.n_limited = 0
+        self._thread = None
+
+    @property
+    def baseurl(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def content_value(note, field):
+    value = note["content"].get(field)
+    if isinstance(value, dict) and "value" in value:
+        return value["value"]
+    return value
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        server = self.server
+        server.n_requests += 1
+        if server.limiter is not None:
+            wait = server.limiter.take()
+            if wait:
+                server.n_limited += 1
+                self.send_json(
+                    429,
+                    {"name": "RateLimitError", "message": "Too many requests"},
+                    {"Retry-After": str(math.ceil(wait))},
+                )
+                return
+        if server.latency:
+            time.sleep(server.latency)
+
+        url = urlsplit(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        if url.path == "/notes":
+            self.get_notes(params)
+        elif url.path == "/notes/search":
+            self.search_notes(params)
+        elif url.path == "/groups" and params.get("id") == "venues":
+            group = {"id": "venues", "members": server.venues}
+            self.send_json(200, {"groups": [group]})
+        else:
+            self.send_json(404, {"name": "NotFoundError", "message": url.path})
+
+    def get_notes(self, params):
+        server = self.server
+        notes = server.notes
+        start = 0
+        if "after" in params:
+            start = bisect.bisect_right(server.ids, params["after"])
+        notes = notes[start:]
+        if "content.venueid" in params:
+            venue = params["content.venueid"]
+            notes = [note for note in notes if content_value(note, "venueid") == venue]
+        if "invitation" in params:
+            invitation = params["invitation"]
+            notes = [
+                note
+                for note in notes
+                if note.get("invitation") == invitation
+                or invitation in note.get("invitations", [])
+            ]
+        for key in ("id", "forum"):
+            if key in params:
+                notes = [note for note in notes if note[key] == params[key]]
+        if params.get("sort") == "tmdate:desc":
+            notes = sorted(notes, key=lambda note: -note["tmdate"])
+        self.send_page(notes, params)
+
+    def search_notes(self, params):
+        term = params.get("term", "").lower()
+        notes = [
+            note
+            for note in self.server.notes
+            if term in (content_value(note, "title") or "").lower()
+            or term in (content_value(note, "abstract") or "").lower()
+        ]
+        self.send_page(notes, params)
+
+    def send_page(self, notes, params):
+        offset = int(params.get("offset", 0))
+        limit = min(int(params.get("limit", 1000)), 1000)
+        page = []
+        for note in notes[offset : offset + limit]:
+            body = strip_private(note)
+            if params.get("details") == "directReplies":
+                body["details"] = {"directReplies": note["_replies"]}
+            page.append(body)
+        self.send_json(200, {"notes": page, "count": len(notes)})
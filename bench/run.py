@@ -0,0 +1,330 @@
+"""
+Benchmark the scraper's stages on a synthetic corpus served by local mock
+OpenReview hosts.
+
+    python -m bench.run --sizes 1000 10000 --latency 0.02 --save baseline
+    python -m bench.run --sizes 1000 10000 --compare baseline
+
+Reports throughput, latency percentiles and peak memory for fetch, filter
+(OR/AND/MIX), extract and CSV write; filter, extract and CSV run on the
+PaperRecords the scraper keeps, not raw notes. Results are saved as JSON under
+bench/baselines/ and can be compared against an earlier run.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import openreview
+
+from bench.corpus import V1_VENUES, V2_VENUES, make_corpus, strip_private
+from bench.mock_server import MockOpenReview
+from extract import Extractor
+from fetch_profile import FetchProfile
+from filters import KeywordMatcher, abstract_filter, keywords_filter, title_filter
+from paper import get_papers
+from sink import CSVSink
+from venue import group_venues
+
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), "baselines")
+
+KEYWORDS = {
+    "OR": ["large language model", "game theory", "reinforcement learning"],
+    "AND": ["large language model", "reinforcement learning"],
+    "MIX": [
+        ["Large Language Model", "LLM"],
+        ["Game Theory", "equilibrium", "Nash"],
+        ["Reinforcement Learning", "RL", "Multi-Agent"],
+    ],
+}
+FILTERS = [(title_filter, (), {}), (keywords_filter, (), {}), (abstract_filter, (), {})]
+EXTRACTOR = Extractor(
+    fields=["forum"],
+    subfields={"content": ["title", "authors", "keywords", "abstract", "pdf", "match"]},
+)
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    idx = min(len(sorted_values) - 1, max(0, round(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[idx]
+
+
+def summarize(n_items, seconds, latencies, peak_bytes):
+    latencies = sorted(latencies)
+    return {
+        "items": n_items,
+        "seconds": round(seconds, 4),
+        "throughput": round(n_items / seconds, 1) if seconds else None,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 4) if latencies else None,
+        "p95_ms": round(percentile(latencies, 95) * 1000, 4) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99) * 1000, 4) if latencies else None,
+        "mean_ms": (
+            round(statistics.fmean(latencies) * 1000, 4) if latencies else None
+        ),
+        "peak_mb": round(peak_bytes / 2**20, 2) if peak_bytes is not None else None,
+    }
+
+
+def measure(run, memory=True):
+    """
+    Time `run()`, which returns (n_items, latencies), then run it again under
+    tracemalloc for its peak memory, so tracing does not skew the timings.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        n_items, latencies = run()
+        seconds = time.perf_counter() - start
+        peak = None
+        if memory:
+            tracemalloc.start()
+            run()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    return summarize(n_items, seconds, latencies, peak)
+
+
+def timed_map(fn, items):
+    latencies = []
+    results = []
+    for item in items:
+        start = time.perf_counter()
+        results.append(fn(item))
+        latencies.append(time.perf_counter() - start)
+    return results, latencies
+
+
+def make_clients(servers):
+    clients = (
+        openreview.Client(baseurl=servers[0].baseurl),
+        openreview.api.OpenReviewClient(baseurl=servers[1].baseurl),
+    )
+    latencies = []
+    for client in clients:
+        client.session.hooks["response"].append(
+            lambda response, *args, **kwargs: latencies.append(
+                response.elapsed.total_seconds()
+            )
+        )
+    return clients, latencies
+
+
+def load_papers(corpus):
+    """
+    The corpus as the scraper filters and extracts it: notes turned into
+    PaperRecords by the fetch profile of the benchmark's extractor.
+    """
+    profile = FetchProfile.from_scraper(EXTRACTOR, keywords=[])
+    notes_v1 = [openreview.Note.from_json(strip_private(note)) for note in corpus[1]]
+    notes_v2 = [
+        openreview.api.Note.from_json(strip_private(note)) for note in corpus[2]
+    ]
+    return list(profile.normalize(notes_v1, 1)) + list(profile.normalize(notes_v2, 2))
+
+
+def bench_fetch(corpus, args):
+    servers = [
+        MockOpenReview(corpus[1], V1_VENUES, args.latency, args.rate).start(),
+        MockOpenReview(corpus[2], V2_VENUES, args.latency, args.rate).start(),
+    ]
+    grouped_venues = group_venues(V1_VENUES + V2_VENUES, ["conference"])
+    try:
+
+        def run():
+            clients, latencies = make_clients(servers)
+            papers = get_papers(
+                clients, grouped_venues, True, max_workers=args.max_workers
+            )
+            n_papers = sum(
+                len(venue_papers)
+                for grouped in papers.values()
+                for venue_papers in grouped.values()
+            )
+            return n_papers, latencies
+
+        result = measure(run, args.memory)
+        result["requests"] = sum(server.n_requests for server in servers)
+        result["rate_limited"] = sum(server.n_limited for server in servers)
+        return result
+    finally:
+        for server in servers:
+            server.stop()
+
+
+def bench_filter(notes, mode, args):
+    def run():
+        matcher = KeywordMatcher(KEYWORDS[mode], FILTERS, mode)
+        results, latencies = timed_map(matcher.match, notes)
+        return len(results), latencies
+
+    result = measure(run, args.memory)
+    matcher = KeywordMatcher(KEYWORDS[mode], FILTERS, mode)
+    result["matched"] = sum(1 for note in notes if matcher.match(note)[2])
+    return result
+
+
+def bench_extract(notes, args):
+    def run():
+        def extract(note):
+            note.content["match"] = {"title_filter": "game theory"}
+            return EXTRACTOR(note)
+
+        results, latencies = timed_map(extract, notes)
+        return len(results), latencies
+
+    return measure(run, args.memory)
+
+
+def bench_csv(notes, args):
+    rows = [EXTRACTOR(note) for note in notes]
+
+    def run():
+        latencies = []
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with CSVSink(os.path.join(tmp_dir, "papers.csv")) as sink:
+                for i in range(0, len(rows), sink.batch_size):
+                    start = time.perf_counter()
+                    sink.write_rows(rows[i : i + sink.batch_size])
+                    sink.flush()
+                    latencies.append(time.perf_counter() - start)
+        return len(rows), latencies
+
+    result = measure(run, args.memory)
+    result["latency_unit"] = "batch"
+    return result
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(args):
+    results = {}
+    for size in args.sizes:
+        corpus = make_corpus(size, seed=args.seed)
+        if "fetch" in args.stages:
+            results[f"{size}/fetch"] = bench_fetch(corpus, args)
+            report(f"{size}/fetch", results[f"{size}/fetch"])
+        notes = load_papers(corpus)
+        if "filter" in args.stages:
+            for mode in args.modes:
+                results[f"{size}/filter/{mode}"] = bench_filter(notes, mode, args)
+                report(f"{size}/filter/{mode}", results[f"{size}/filter/{mode}"])
+        if "extract" in args.stages:
+            results[f"{size}/extract"] = bench_extract(notes, args)
+            report(f"{size}/extract", results[f"{size}/extract"])
+        if "csv" in args.stages:
+            results[f"{size}/csv"] = bench_csv(notes, args)
+            report(f"{size}/csv", results[f"{size}/csv"])
+    return {
+        "meta": {
+            "revision": git_revision(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "latency": args.latency,
+            "rate": args.rate,
+            "max_workers": args.max_workers,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+
+
+def report(name, result):
+    print(
+        f"{name:<22} {result['throughput'] or 0:>12,.1f}/s"
+        f"  p50 {result['p50_ms'] or 0:>9.3f}ms"
+        f"  p95 {result['p95_ms'] or 0:>9.3f}ms"
+        f"  p99 {result['p99_ms'] or 0:>9.3f}ms"
+        f"  peak {result['peak_mb'] if result['peak_mb'] is not None else '-':>8} MB"
+    )
+
+
+def compare(current, baseline):
+    """
+    Print the throughput and p95 of every benchmark relative to a baseline.
+    """
+    print(
+        f"\nCompared to {baseline['meta'].get('revision')} ({baseline['meta']['time']})"
+    )
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None or not base.get("throughput"):
+            continue
+        speedup = result["throughput"] / base["throughput"]
+        p95 = ""
+        if result.get("p95_ms") and base.get("p95_ms"):
+            p95 = f"  p95 x{result['p95_ms'] / base['p95_ms']:.2f}"
+        print(f"{name:<22} throughput x{speedup:.2f}{p95}")
+
+
+def baseline_path(name):
+    if name.endswith(".json") or os.sep in name:
+        return name
+    return os.path.join(BASELINE_DIR, f"{name}.json")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument(
+        "--stages",
+        nargs="+",
+        default=["fetch", "filter", "extract", "csv"],
+        choices=["fetch", "filter", "extract", "csv"],
+    )
+    parser.add_argument(
+        "--modes", nargs="+", default=["OR", "AND", "MIX"], choices=list(KEYWORDS)
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="seconds added per request"
+    )
+    parser.add_argument(
+        "--rate", type=float, default=None, help="requests/s before the server 429s"
+    )
+    parser.add_argument("--max-workers", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--no-memory",
+        dest="memory",
+        action="store_false",
+        help="skip the tracemalloc pass",
+    )
+    parser.add_argument("--save", help="baseline name or path to save results to")
+    parser.add_argument("--compare", help="baseline name or path to compare against")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args)
+    if args.compare:
+        with open(baseline_path(args.compare)) as fp:
+            compare(results, json.load(fp))
+    if args.save:
+        path = baseline_path(args.save)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as fp:
+            json.dump(results, fp, indent=2)
+        print(f"Saved at {path}")
+
+
+if __name__ == "__main__":
+    main()
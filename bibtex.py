@@ -0,0 +1,362 @@
+import datetime
+import json
+import os
+import re
+import threading
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import fetch_bibtex_from_data_bibtex, unwrap_value
+from venue import parse_venue
+
+# booktitle of each conference, by the part of the venue ID before the year
+VENUE_NAMES = {
+    "ICLR.cc": "International Conference on Learning Representations",
+    "ICML.cc": "International Conference on Machine Learning",
+    "NeurIPS.cc": "Advances in Neural Information Processing Systems",
+    "aclweb.org/ACL": "Annual Meeting of the Association for Computational Linguistics",
+    "aclweb.org/NAACL": "Conference of the North American Chapter of the Association for Computational Linguistics",
+    "aclweb.org/EACL": "Conference of the European Chapter of the Association for Computational Linguistics",
+    "EMNLP": "Conference on Empirical Methods in Natural Language Processing",
+    "colmweb.org/COLM": "Conference on Language Modeling",
+    "aclweb.org/ACL/ARR": "ACL Rolling Review",
+    "auai.org/UAI": "Conference on Uncertainty in Artificial Intelligence",
+    "aistats.org/AISTATS": "International Conference on Artificial Intelligence and Statistics",
+    "learningtheory.org/COLT": "Conference on Learning Theory",
+    "robot-learning.org/CoRL": "Conference on Robot Learning",
+    "MIDL.io": "Medical Imaging with Deep Learning",
+    "logconference.io/LOG": "Learning on Graphs Conference",
+    "AAAI.org": "AAAI Conference on Artificial Intelligence",
+    "ACM.org/TheWebConf": "The Web Conference",
+    "thecvf.com/CVPR": "IEEE/CVF Conference on Computer Vision and Pattern Recognition",
+}
+# venues that publish articles rather than proceedings
+JOURNALS = {
+    "TMLR": "Transactions on Machine Learning Research",
+    "DMLR": "Journal of Data-centric Machine Learning Research",
+}
+STOPWORDS = {"a", "an", "the", "on", "of", "in", "for", "to", "and", "with", "via"}
+LATEX_SPECIALS = {
+    "\\": r"\textbackslash{}",
+    "&": r"\&",
+    "%": r"\%",
+    "$": r"\$",
+    "#": r"\#",
+    "_": r"\_",
+    "{": r"\{",
+    "}": r"\}",
+    "~": r"\textasciitilde{}",
+    "^": r"\textasciicircum{}",
+}
+LATEX_SPECIALS_RE = re.compile(r"[\\&%$#_{}~^]")
+MATH_RE = re.compile(r"(\$[^$]+\$)")
+# words whose case must survive bibliography styles: acronyms, CamelCase, GPT-4
+PROTECT_RE = re.compile(r"\b(\w*[A-Z]\w*[A-Z0-9][\w-]*|\w+[A-Z][\w-]*)")
+ENTRY_KEY_RE = re.compile(r"^(\s*@\w+\s*\{\s*)([^,\s]*)")
+
+
+def latex_escape(text, protect=False):
+    """
+    Escape LaTeX special characters, leaving $...$ math untouched. With
+    protect, words with inner capitals are wrapped in braces.
+    """
+    parts = MATH_RE.split(text)
+    for i, part in enumerate(parts):
+        if i % 2:
+            continue
+        part = LATEX_SPECIALS_RE.sub(lambda m: LATEX_SPECIALS[m.group()], part)
+        if protect:
+            part = PROTECT_RE.sub(r"{\1}", part)
+        parts[i] = part
+    return " ".join("".join(parts).split())
+
+
+def ascii_word(text):
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode()
+    return re.sub(r"[^a-z0-9]", "", text.lower())
+
+
+def key_base(authors, year, title):
+    """
+    Citation key of the form lastnameYEARword, e.g. muller2024training.
+    """
+    last_name = ascii_word(authors[0].split()[-1]) if authors else ""
+    words = [ascii_word(word) for word in title.split()]
+    word = next((w for w in words if w and w not in STOPWORDS), "")
+    return f"{last_name or 'anon'}{year or ''}{word or 'paper'}"
+
+
+def read_keys(fpath):
+    """
+    Citation keys of the entries in an existing .bib file.
+    """
+    try:
+        with open(fpath, encoding="utf-8") as fp:
+            text = fp.read()
+    except OSError:
+        return set()
+    return set(re.findall(r"@\w+\s*\{\s*([^,\s]+)\s*,", text))
+
+
+class CitationKeys:
+    """
+    Hands out citation keys unique across an export, in the order entries
+    are added: the second smith2024learning becomes smith2024learninga.
+    """
+
+    def __init__(self, taken=()):
+        self.taken = set(taken)
+        self._lock = threading.Lock()
+
+    def assign(self, base):
+        with self._lock:
+            key = base
+            n = 0
+            while key in self.taken:
+                n += 1
+                suffix = ""
+                i = n
+                while i:
+                    i, rem = divmod(i - 1, 26)
+                    suffix = chr(ord("a") + rem) + suffix
+                key = f"{base}{suffix}"
+            self.taken.add(key)
+            return key
+
+    def rekey(self, entry):
+        """
+        The entry under a unique key derived from its own.
+        """
+        match = ENTRY_KEY_RE.match(entry)
+        if match is None:
+            return entry
+        key = self.assign(match.group(2) or "paper")
+        return entry[: match.start(2)] + key + entry[match.end(2) :]
+
+
+def paper_venue(paper, venue=None):
+    """
+    Venue ID of a paper: the given venue, else its venueid or invitation.
+    """
+    if venue:
+        return venue
+    venueid = unwrap_value(paper.content.get("venueid"))
+    if venueid:
+        return venueid
+    invitations = getattr(paper, "invitations", None) or [
+        getattr(paper, "invitation", None)
+    ]
+    for invitation in invitations:
+        if invitation and "/-/" in invitation:
+            return invitation.split("/-/")[0]
+    return None
+
+
+def paper_year(paper):
+    """
+    Year the paper was published or posted, for venues without a year (TMLR).
+    """
+    for attribute in ("pdate", "cdate", "tcdate"):
+        timestamp = getattr(paper, attribute, None)
+        if isinstance(timestamp, int):
+            return str(datetime.datetime.fromtimestamp(timestamp / 1000).year)
+    return None
+
+
+def local_bibtex(paper, venue=None):
+    """
+    BibTeX entry built from the paper's metadata, or None if the metadata
+    is not good enough (no title, anonymous or missing authors, no year).
+    """
+    title = unwrap_value(paper.content.get("title"))
+    authors = unwrap_value(paper.content.get("authors")) or []
+    if isinstance(authors, str):
+        authors = [authors]
+    authors = [str(unwrap_value(author)).strip() for author in authors]
+    authors = [author for author in authors if author]
+    if not title or not str(title).strip() or not authors:
+        return None
+    if any(author.lower().startswith("anonymous") for author in authors):
+        return None
+    parsed = parse_venue(paper_venue(paper, venue) or "")
+    year = parsed["year"] or paper_year(paper)
+    if year is None:
+        return None
+
+    conference = parsed["conference"]
+    short_name = conference.split("/")[-1].split(".")[0] or conference
+    venueid = unwrap_value(paper.content.get("venueid")) or ""
+    published = "Submission" not in venueid.split("/")[-1]
+    fields = [
+        ("title", latex_escape(str(title), protect=True)),
+        ("author", " and ".join(latex_escape(author) for author in authors)),
+    ]
+    if short_name in JOURNALS or conference in JOURNALS:
+        entry_type = "article"
+        fields.append(("journal", JOURNALS.get(short_name, JOURNALS.get(conference))))
+    elif published:
+        entry_type = "inproceedings"
+        booktitle = VENUE_NAMES.get(conference, short_name)
+        if parsed["track"].startswith("Workshop/"):
+            workshop = parsed["track"].split("/", 1)[1].replace("_", " ")
+            booktitle = f"{booktitle}, {workshop} Workshop"
+        fields.append(("booktitle", latex_escape(booktitle)))
+    else:
+        entry_type = "misc"
+        fields.append(("note", latex_escape(f"Submitted to {short_name} {year}")))
+    fields.append(("year", year))
+    fields.append(("url", f"https://openreview.net/forum?id={paper.forum}"))
+    key = key_base(authors, year, str(title))
+    body = ",\n".join(f"  {name}={{{value}}}" for name, value in fields)
+    return f"@{entry_type}{{{key},\n{body}\n}}"
+
+
+class BibtexBuilder:
+    """
+    Builds BibTeX entries locally from paper metadata, and fetches the
+    forum page's data-bibtex only for papers whose metadata is not good
+    enough. Fetched entries are cached in `cache_path`, one JSON line per
+    forum, so they are never fetched twice.
+
+    Args:
+      cache_path: JSONL file of fetched entries, None for no cache
+      session: Session the forum pages are fetched with, by default the
+        process-wide throttled session
+      timeout: Seconds before a forum page fetch is abandoned
+      max_workers: Concurrent forum page fetches in `build`
+      fetch: Fetch forum pages at all; if False, papers without local
+        metadata get no entry
+      failures: Optional FailureLog recording the forum pages that could not
+        be fetched or had no data-bibtex
+    """
+
+    def __init__(
+        self,
+        cache_path=".cache/bibtex.jsonl",
+        session=None,
+        timeout=30,
+        max_workers=8,
+        fetch=True,
+        failures=None,
+    ):
+        self.cache_path = cache_path
+        self.session = session
+        self.timeout = timeout
+        self.max_workers = max_workers
+        self.fetch = fetch
+        self.failures = failures
+        self.n_local = 0
+        self.n_cached = 0
+        self.n_fetched = 0
+        self._lock = threading.Lock()
+        self.cache = {}
+        if cache_path is not None and os.path.exists(cache_path):
+            with open(cache_path, encoding="utf-8") as fp:
+                for line in fp:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    self.cache[entry["forum"]] = entry["bibtex"]
+
+    def __call__(self, paper, venue=None):
+        return self.get(paper, venue)
+
+    def _store(self, forum, bibtex):
+        with self._lock:
+            self.cache[forum] = bibtex
+            if self.cache_path is None:
+                return
+            os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+            with open(self.cache_path, "a", encoding="utf-8") as fp:
+                fp.write(json.dumps({"forum": forum, "bibtex": bibtex}) + "\n")
+
+    def remote(self, forum):
+        """
+        The forum page's data-bibtex, from the cache or fetched; "" if none.
+        """
+        with self._lock:
+            bibtex = self.cache.get(forum)
+            if bibtex is not None:
+                self.n_cached += 1
+                return bibtex
+        if not self.fetch:
+            return ""
+        bibtex = fetch_bibtex_from_data_bibtex(
+            forum, session=self.session, timeout=self.timeout, failures=self.failures
+        )
+        with self._lock:
+            self.n_fetched += 1
+        if bibtex:
+            self._store(forum, bibtex)
+        return bibtex
+
+    def get(self, paper, venue=None):
+        """
+        BibTeX entry of a paper, "" if it has none.
+        """
+        bibtex = local_bibtex(paper, venue)
+        if bibtex is not None:
+            with self._lock:
+                self.n_local += 1
+            return bibtex
+        return self.remote(paper.forum)
+
+    def build(self, papers, venues=None):
+        """
+        Entries of many papers, in order: every local entry first, then the
+        forum pages of the rest fetched concurrently.
+
+        Args:
+          papers: List of papers
+          venues: Optional list of the venue ID of each paper
+        """
+        venues = venues or [None] * len(papers)
+        entries = [local_bibtex(paper, venue) for paper, venue in zip(papers, venues)]
+        todo = [i for i, entry in enumerate(entries) if entry is None]
+        self.n_local += len(entries) - len(todo)
+        if todo:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                fetched = executor.map(self.remote, [papers[i].forum for i in todo])
+                for i, bibtex in zip(todo, fetched):
+                    entries[i] = bibtex
+        return entries
+
+
+def write_bibtex(entries, fpath, append=False, rekey=True):
+    """
+    Write entries to a .bib file, returning the number of entries written.
+    With rekey, entries get citation keys unique across the file; without,
+    they are written as they are (e.g. already keyed by CitationKeys).
+    """
+    keys = CitationKeys(read_keys(fpath) if append else ()) if rekey else None
+    n_entries = 0
+    with open(fpath, "a" if append else "w", encoding="utf-8") as fp:
+        for entry in entries:
+            if not entry:
+                continue
+            if keys is not None:
+                entry = keys.rekey(entry)
+            fp.write(entry.strip() + "\n\n")
+            n_entries += 1
+    return n_entries
+
+
+def save_bibtex(papers, fpath, builder=None, append=False):
+    """
+    Write a .bib file for a dictionary of papers by group and venue, as
+    returned by `get_papers`. Returns the number of entries written.
+    """
+    builder = builder or BibtexBuilder()
+    items = [
+        (paper, venue)
+        for grouped_venues in papers.values()
+        for venue, venue_papers in grouped_venues.items()
+        for paper in venue_papers
+    ]
+    entries = builder.build(
+        [paper for paper, _ in items], [venue for _, venue in items]
+    )
+    n_entries = write_bibtex(entries, fpath, append=append)
+    print(f"BibTeX saved at: {fpath}")
+    return n_entries
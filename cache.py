@@ -0,0 +1,190 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+
+import openreview
+
+NOTE_CLASSES = {1: openreview.Note, 2: openreview.api.Note}
+
+
+def note_to_json(note):
+    """
+    Serialize an OpenReview note, keeping the fields `to_json` leaves out.
+    """
+    body = note.to_json()
+    for key in ("number", "tcdate", "tmdate", "details", "domain"):
+        if body.get(key) is None and getattr(note, key, None) is not None:
+            body[key] = getattr(note, key)
+    return body
+
+
+def note_from_json(body, api_version):
+    return NOTE_CLASSES[api_version].from_json(body)
+
+
+class NoteCache:
+    """
+    On-disk cache of raw notes, one gzipped JSONL file per
+    (API version, venue, query).
+
+    An incremental refresh only merges in notes modified since the newest
+    cached `tmdate`: notes that stopped matching the query (withdrawn,
+    rejected, moved to another venueid) are not removed, and a new reply does
+    not change its forum note's `tmdate`. Queries with `details` (e.g.
+    directReplies) are therefore always refreshed whole, and other entries
+    are refreshed whole once their last full fetch is older than
+    `max_incremental_age`.
+
+    Args:
+      cache_dir: Directory holding the cached notes
+      ttl: Seconds after which an entry is refreshed, None to never expire
+      frozen_venues: Venue IDs that are never refreshed once cached
+      incremental: Refresh expired entries by pulling only the notes
+        modified since the newest cached `tmdate`
+      page_size: Page size used for incremental refreshes
+      max_incremental_age: Seconds since the last full fetch after which an
+        expired entry is fetched whole again, None to always refresh
+        incrementally
+    """
+
+    def __init__(
+        self,
+        cache_dir=".cache/notes",
+        ttl=None,
+        frozen_venues=(),
+        incremental=True,
+        page_size=1000,
+        max_incremental_age=7 * 24 * 60 * 60,
+    ):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.frozen_venues = set(frozen_venues)
+        self.incremental = incremental
+        self.page_size = page_size
+        self.max_incremental_age = max_incremental_age
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self._lock = threading.Lock()
+
+    def _path(self, api_version, venue, query):
+        key = json.dumps(query, sort_keys=True)
+        digest = hashlib.sha1(key.encode()).hexdigest()[:12]
+        name = venue.replace("/", "_")
+        return os.path.join(self.cache_dir, f"v{api_version}", f"{name}-{digest}")
+
+    def _read(self, path, api_version):
+        with gzip.open(f"{path}.jsonl.gz", "rt") as fp:
+            return [note_from_json(json.loads(line), api_version) for line in fp]
+
+    def _read_meta(self, path):
+        try:
+            with open(f"{path}.json") as fp:
+                return json.load(fp)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, path, notes, meta):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.jsonl.gz.tmp"
+        with gzip.open(tmp_path, "wt") as fp:
+            for note in notes:
+                fp.write(json.dumps(note_to_json(note)) + "\n")
+        os.replace(tmp_path, f"{path}.jsonl.gz")
+        with open(f"{path}.json", "w") as fp:
+            json.dump(meta, fp)
+
+    def _is_fresh(self, venue, meta):
+        if venue in self.frozen_venues or self.ttl is None:
+            return True
+        return time.time() - meta["fetched_at"] < self.ttl
+
+    def _can_refresh_incrementally(self, query, meta):
+        if not self.incremental or query.get("details") is not None:
+            return False
+        if self.max_incremental_age is None:
+            return True
+        # entries cached before full fetches were recorded count as old
+        full_fetched_at = meta.get("full_fetched_at", 0)
+        return time.time() - full_fetched_at < self.max_incremental_age
+
+    def _fetch_modified(self, client, query, since):
+        """
+        Page through the query newest-modified first, stopping at the first
+        page that reaches notes older than `since`.
+        """
+        query = {k: v for k, v in query.items() if k != "sort"}
+        modified = []
+        offset = 0
+        while True:
+            page = client.get_notes(
+                sort="tmdate:desc", limit=self.page_size, offset=offset, **query
+            )
+            for note in page:
+                if (note.tmdate or 0) < since:
+                    return modified
+                modified.append(note)
+            if len(page) < self.page_size:
+                return modified
+            offset += self.page_size
+
+    def get_all_notes(self, client, api_version, venue, query):
+        """
+        Return the notes for a query, from the cache when it is fresh.
+
+        Args:
+          client: OpenReview client for `api_version`
+          api_version: 1 or 2
+          venue: Venue ID the query belongs to
+          query: Keyword arguments for `get_all_notes`
+
+        Returns:
+          List of notes
+        """
+        path = self._path(api_version, venue, query)
+        meta = self._read_meta(path)
+        if meta is not None and os.path.exists(f"{path}.jsonl.gz"):
+            notes = self._read(path, api_version)
+            if self._is_fresh(venue, meta):
+                with self._lock:
+                    self.hits += 1
+                return notes
+            if self._can_refresh_incrementally(query, meta):
+                modified = self._fetch_modified(client, query, meta["max_tmdate"])
+                by_id = {note.id: note for note in notes}
+                for note in modified:
+                    by_id[note.id] = note
+                notes = list(by_id.values())
+                with self._lock:
+                    self.refreshes += 1
+                self._write(
+                    path,
+                    notes,
+                    self._meta(
+                        api_version, venue, query, notes, meta.get("full_fetched_at", 0)
+                    ),
+                )
+                return notes
+
+        notes = client.get_all_notes(**query)
+        with self._lock:
+            self.misses += 1
+        self._write(path, notes, self._meta(api_version, venue, query, notes))
+        return notes
+
+    def _meta(self, api_version, venue, query, notes, full_fetched_at=None):
+        fetched_at = time.time()
+        return {
+            "api_version": api_version,
+            "venue": venue,
+            "query": query,
+            "fetched_at": fetched_at,
+            # time of the last fetch of the whole query, not just modified notes
+            "full_fetched_at": (
+                fetched_at if full_fetched_at is None else full_fetched_at
+            ),
+            "max_tmdate": max((note.tmdate or 0 for note in notes), default=0),
+        }
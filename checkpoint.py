@@ -0,0 +1,256 @@
+import gzip
+import hashlib
+import json
+import os
+import shutil
+
+from metrics import PRINT_REPORTER
+
+ENRICHED_FIELDS = ["pdf_local", "bibtex"]
+
+
+def run_fingerprint(scraper):
+    """
+    Hash of the settings that decide which papers match, so a checkpoint is
+    only resumed by the run that wrote it.
+    """
+    filters = [
+        (getattr(filter_, "__name__", repr(filter_)), repr(args), repr(kwargs))
+        for filter_, args, kwargs in scraper.filters
+    ]
+    key = json.dumps(
+        [
+            scraper.confs,
+            scraper.years,
+            scraper.keywords,
+            scraper.filter_mode,
+            scraper.only_accepted,
+            scraper.groups,
+            filters,
+        ],
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+class Checkpoint:
+    """
+    On-disk progress of a scrape, so an interrupted run can pick up from the
+    last completed unit instead of starting over.
+
+    The folder holds:
+      - notes/: notes fetched so far, one gzipped JSONL file per
+        (API version, venue, query) that grows page by page, with a meta file
+        holding the `after` cursor of the next page and whether it is done
+      - matches/: filtered results, one JSON file per venue
+      - enriched.jsonl: PDF path and BibTeX of every enriched forum
+      - written.txt: forums whose rows were flushed to the CSV (streaming)
+      - state.json: fingerprint of the run settings; matches, enrichment and
+        written rows of a run with other settings are discarded
+
+    Args:
+      root: Folder the checkpoint is kept in
+      cache: Optional NoteCache; venues are then fetched through it whole,
+        since it already keeps them across runs
+      page_size: Notes per page
+      reporter: Optional ProgressReporter, by default progress is printed
+    """
+
+    def __init__(self, root, cache=None, page_size=1000, reporter=None):
+        self.root = root
+        self.cache = cache
+        self.page_size = page_size
+        self.reporter = reporter or PRINT_REPORTER
+        self.enriched = {}
+        self.written = set()
+        self.pending = []
+
+    def _path(self, *parts):
+        return os.path.join(self.root, *parts)
+
+    def open(self, fingerprint, resume=True):
+        """
+        Load the checkpoint, or start a new one if resume is False.
+        """
+        if not resume:
+            self.clear()
+        os.makedirs(self._path("notes"), exist_ok=True)
+        os.makedirs(self._path("matches"), exist_ok=True)
+        try:
+            with open(self._path("state.json")) as fp:
+                state = json.load(fp)
+        except (OSError, ValueError):
+            state = {}
+        if state.get("fingerprint") not in (None, fingerprint):
+            self.reporter.info(
+                "Run settings changed since the checkpoint, re-filtering all venues"
+            )
+            shutil.rmtree(self._path("matches"))
+            os.makedirs(self._path("matches"))
+            for name in ("enriched.jsonl", "written.txt"):
+                if os.path.exists(self._path(name)):
+                    os.remove(self._path(name))
+        with open(self._path("state.json"), "w") as fp:
+            json.dump({"fingerprint": fingerprint}, fp)
+
+        self.enriched = {}
+        if os.path.exists(self._path("enriched.jsonl")):
+            with open(self._path("enriched.jsonl")) as fp:
+                for line in fp:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # last line cut off by a crash
+                        continue
+                    self.enriched[entry.pop("forum")] = entry
+        self.written = set()
+        if os.path.exists(self._path("written.txt")):
+            with open(self._path("written.txt")) as fp:
+                self.written = {line.strip() for line in fp if line.strip()}
+        self.pending = []
+        return self
+
+    def clear(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    # notes
+
+    def _notes_path(self, api_version, venue, query):
+        key = json.dumps(query, sort_keys=True)
+        digest = hashlib.sha1(key.encode()).hexdigest()[:12]
+        name = venue.replace("/", "_")
+        return self._path("notes", f"v{api_version}", f"{name}-{digest}")
+
+    def get_all_notes(self, client, api_version, venue, query):
+        """
+        Notes of a query, continuing from the last saved page. Same interface
+        as `NoteCache.get_all_notes`, so it can stand in for the cache.
+        """
+        from cache import note_from_json, note_to_json
+
+        path = self._notes_path(api_version, venue, query)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            with open(f"{path}.json") as fp:
+                meta = json.load(fp)
+        except (OSError, ValueError):
+            meta = {"after": None, "done": False}
+
+        notes = {}
+        if meta["after"] is not None or meta["done"]:
+            with gzip.open(f"{path}.jsonl.gz", "rt") as fp:
+                for line in fp:
+                    note = note_from_json(json.loads(line), api_version)
+                    notes[note.id] = note
+        elif os.path.exists(f"{path}.jsonl.gz"):
+            # notes written without a cursor to resume from
+            os.remove(f"{path}.jsonl.gz")
+        if meta["done"]:
+            return list(notes.values())
+
+        if self.cache is not None:
+            pages = [self.cache.get_all_notes(client, api_version, venue, query)]
+        else:
+            pages = self._pages(client, query, meta["after"])
+        for page in pages:
+            # gzip members can be appended, so each page is one cheap write
+            with gzip.open(f"{path}.jsonl.gz", "at") as fp:
+                for note in page:
+                    fp.write(json.dumps(note_to_json(note)) + "\n")
+                    notes[note.id] = note
+            if page:
+                meta["after"] = page[-1].id
+            with open(f"{path}.json", "w") as fp:
+                json.dump(meta, fp)
+        meta["done"] = True
+        with open(f"{path}.json", "w") as fp:
+            json.dump(meta, fp)
+        return list(notes.values())
+
+    def _pages(self, client, query, after=None):
+        params = dict(query, sort="id", limit=self.page_size)
+        while True:
+            if after is not None:
+                params["after"] = after
+            page = client.get_notes(**params)
+            yield page
+            if len(page) < self.page_size:
+                return
+            after = page[-1].id
+
+    # filtered results
+
+    def _matches_path(self, venue):
+        return self._path("matches", venue.replace("/", "_") + ".json")
+
+    def load_matches(self, venue, papers):
+        """
+        Filtered results of a venue as (paper, keyword, filter type) tuples,
+        or None if the venue has not been filtered yet.
+        """
+        try:
+            with open(self._matches_path(venue)) as fp:
+                matches = json.load(fp)
+        except (OSError, ValueError):
+            return None
+        by_forum = {paper.forum: paper for paper in papers}
+        return [
+            (by_forum[forum], keyword, filter_type)
+            for forum, keyword, filter_type in matches
+            if forum in by_forum
+        ]
+
+    def save_matches(self, venue, matches):
+        tmp_path = f"{self._matches_path(venue)}.tmp"
+        with open(tmp_path, "w") as fp:
+            json.dump(
+                [
+                    [paper.forum, keyword, filter_type]
+                    for paper, keyword, filter_type in matches
+                ],
+                fp,
+            )
+        os.replace(tmp_path, self._matches_path(venue))
+
+    # enrichment
+
+    def enrich(self, enricher, papers):
+        """
+        Enrich the papers not enriched by an earlier run, and restore the
+        PDF path and BibTeX of the others.
+        """
+        todo = []
+        for paper in papers:
+            fields = self.enriched.get(paper.forum)
+            if fields is None:
+                todo.append(paper)
+            else:
+                paper.content.update(fields)
+        if todo:
+            self.reporter.info(
+                f"Enriching {len(todo)} papers ({len(papers) - len(todo)} done)"
+            )
+        with open(self._path("enriched.jsonl"), "a") as fp:
+            for paper in enricher.imap(todo):
+                fields = {
+                    field: paper.content[field]
+                    for field in ENRICHED_FIELDS
+                    if field in paper.content
+                }
+                self.enriched[paper.forum] = fields
+                fp.write(json.dumps(dict(fields, forum=paper.forum)) + "\n")
+                fp.flush()
+        return papers
+
+    # streamed rows
+
+    def on_flush(self, n_rows):
+        """
+        Mark the forums of the next n_rows rows produced as written; called by
+        the CSV sink once they are on disk.
+        """
+        forums, self.pending = self.pending[:n_rows], self.pending[n_rows:]
+        self.written.update(forums)
+        with open(self._path("written.txt"), "a") as fp:
+            fp.writelines(f"{forum}\n" for forum in forums)
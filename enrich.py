@@ -0,0 +1,129 @@
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from bibtex import BibtexBuilder
+from metrics import NULL_METRICS, PRINT_REPORTER
+from pdfstore import DownloadError, PDFStore
+from transport import Transport
+from utils import unwrap_value
+
+
+def get_pdf_url(paper):
+    pdf = unwrap_value(paper.content.get("pdf"))
+    if not pdf:
+        return f"https://openreview.net/pdf?id={paper.forum}"
+    if pdf.startswith("/"):
+        return f"https://openreview.net{pdf}"
+    return pdf
+
+
+class Enricher:
+    """
+    Fetches PDFs and BibTeX for matched papers concurrently over a pooled
+    keep-alive session, after filtering and before the user `fns` run.
+
+    Sets `paper.content["pdf_local"]` (absolute path, "" on failure) and
+    `paper.content["bibtex"]` ("" on failure). Failures are also recorded
+    in `failures`, the FailureLog of the transport.
+
+    Args:
+      pdf_dir: Folder PDFs are saved to, as `<forum>.pdf`; forums already
+        in its PDFStore manifest are not downloaded again
+      pdfs: Download PDFs
+      bibtex: Add BibTeX, built from the paper's metadata and only fetched
+        from the forum page when the metadata is not good enough
+      max_workers: Maximum number of concurrent requests
+      timeout: Seconds before a request is abandoned
+      retries: Retries on connection errors, 429 and 5xx
+      backoff_factor: Base of the exponential backoff between retries
+      transport: Transport to send requests through, e.g. the scraper's, so
+        rate limits are shared; by default one is made from retries and
+        backoff_factor
+      metrics: Optional Metrics counting failed downloads (`pdf_failures`)
+      reporter: Optional ProgressReporter failed downloads are reported to
+    """
+
+    def __init__(
+        self,
+        pdf_dir="pdfs",
+        pdfs=True,
+        bibtex=True,
+        max_workers=16,
+        timeout=30,
+        retries=3,
+        backoff_factor=1.0,
+        transport=None,
+        bibtex_cache=".cache/bibtex.jsonl",
+        metrics=None,
+        reporter=None,
+    ):
+        self.pdf_dir = pdf_dir
+        self.store = PDFStore(pdf_dir) if pdfs else None
+        self.pdfs = pdfs
+        self.bibtex = bibtex
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.transport = transport or Transport(
+            retries=retries, backoff_factor=backoff_factor
+        )
+        self.failures = self.transport.failures
+        self.metrics = metrics or NULL_METRICS
+        self.reporter = reporter or PRINT_REPORTER
+        self.session = self.transport.session(pool_size=max_workers)
+        self.bibtex_builder = BibtexBuilder(
+            cache_path=bibtex_cache,
+            session=self.session,
+            timeout=timeout,
+            max_workers=max_workers,
+            failures=self.failures,
+        )
+
+    def __call__(self, papers):
+        return self.enrich(papers)
+
+    def enrich_paper(self, paper):
+        forum_id = paper.forum
+        if self.pdfs:
+            pdf_url = get_pdf_url(paper)
+            try:
+                pdf_path = self.store.get(
+                    forum_id, pdf_url, session=self.session, timeout=self.timeout
+                )
+            except DownloadError as e:
+                pdf_path = None
+                self.failures.record("pdf", forum_id, str(e), url=pdf_url)
+                self.metrics.inc("pdf_failures")
+                self.reporter.error(f"Failed to download PDF {pdf_url}: {e}")
+            paper.content["pdf_local"] = os.path.abspath(pdf_path) if pdf_path else ""
+        if self.bibtex:
+            # forum pages that fail are recorded by the builder
+            paper.content["bibtex"] = self.bibtex_builder.get(paper)
+        return paper
+
+    def enrich(self, papers):
+        """
+        Enrich a list of papers in place, returning them in the same order.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(self.enrich_paper, papers))
+
+    def imap(self, items, paper_of=lambda item: item):
+        """
+        Enrich papers from an iterable as they arrive, yielding the items in
+        their original order with at most 2 * max_workers in flight.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            in_flight = deque()
+            for item in items:
+                in_flight.append(
+                    (item, executor.submit(self.enrich_paper, paper_of(item)))
+                )
+                if len(in_flight) >= 2 * self.max_workers:
+                    item, future = in_flight.popleft()
+                    future.result()
+                    yield item
+            while in_flight:
+                item, future = in_flight.popleft()
+                future.result()
+                yield item
@@ -2,8 +2,8 @@ from scraper import Scraper
 from extract import Extractor
 from filters import title_filter, keywords_filter, abstract_filter
 from selector import Selector
+from enrich import Enricher
 from utils import *
-import os
 
 
 years = list(map(str, range(2025, 2026)))
@@ -30,15 +30,6 @@ def modify_paper(paper):
     paper.forum = f"https://openreview.net/forum?id={forum_id}"
     pdf_url = f"https://openreview.net{unwrap_value(paper.content['pdf'])}"
     paper.content["pdf"] = pdf_url
-    # Download PDF
-    pdf_filename = f"{forum_id}.pdf"
-    pdf_path = download_pdf(pdf_url, dest_folder="pdfs", filename=pdf_filename)
-    if pdf_path:
-        paper.content["pdf_local"] = os.path.abspath(pdf_path)
-    else:
-        paper.content["pdf_local"] = ""
-    # Fetch BibTeX only for filtered/selected papers
-    paper.content["bibtex"] = fetch_bibtex_from_data_bibtex(forum_id)
     return paper
 
 
@@ -70,6 +61,8 @@ scraper = Scraper(
     # use instance of Selector, i.e. selector to enable selection
     selector=None,
     filter_mode="MIX",
+    # Download PDFs and fetch BibTeX for matched papers concurrently
+    enricher=Enricher(pdf_dir="pdfs", max_workers=16),
 )
 
 scraper.add_filter(title_filter)
@@ -78,5 +71,5 @@ scraper.add_filter(abstract_filter)
 
 scraper()
 
-save_papers(scraper.papers, fpath="papers.pkl")
-saved_papers = load_papers(fpath="papers.pkl")
+save_papers(scraper.papers, fpath="papers.snap")
+saved_papers = load_papers(fpath="papers.snap")
@@ -0,0 +1,143 @@
+from record import to_records
+
+FILTER_FIELDS = ["title", "abstract", "keywords"]
+
+
+def flatten_keywords(keywords):
+    terms = []
+    for keyword in keywords:
+        if isinstance(keyword, list):
+            terms += flatten_keywords(keyword)
+        elif keyword is not None and str(keyword).strip():
+            terms.append(str(keyword))
+    return list(dict.fromkeys(terms))
+
+
+class FetchProfile:
+    """
+    Decides what each note query asks the server for.
+
+    Args:
+      details: Value of the `details` query parameter, None to leave it out;
+        "directReplies" pulls every review and comment with each paper
+      select: Note fields to return, None for all fields; only sent to
+        API v1, API v2 queries return all fields
+      search_terms: If given, each venue is narrowed on the server with the
+        search endpoint, one query per term, instead of listing every note;
+        only papers containing a term are then fuzzy-filtered. The search
+        endpoint returns no details, so details must then be None
+      search_limit: Page size of search queries
+      records: Turn fetched notes into compact PaperRecords (see record.py)
+      keep_raw: Keep the full note on each record
+      attributes: Other note attributes the records keep, e.g. `signatures`
+    """
+
+    def __init__(
+        self,
+        details="directReplies",
+        select=None,
+        search_terms=None,
+        search_limit=1000,
+        records=True,
+        keep_raw=False,
+        attributes=(),
+    ):
+        if search_terms and details is not None:
+            raise ValueError(
+                "The search endpoint returns notes without details; "
+                "pass details=None with search_terms"
+            )
+        self.details = details
+        self.select = select
+        self.search_terms = search_terms
+        self.search_limit = search_limit
+        self.records = records
+        self.keep_raw = keep_raw
+        self.attributes = attributes
+
+    @classmethod
+    def from_scraper(
+        cls,
+        extractor,
+        keywords,
+        replies=None,
+        select=False,
+        server_search=False,
+        keep_raw=False,
+    ):
+        """
+        Build the narrowest profile the filters and extractor allow.
+
+        Args:
+          extractor: Extractor of the run; replies are requested only if it
+            extracts `details`
+          keywords: Keywords of the run, used as search terms
+          replies: Force requesting (True) or dropping (False) directReplies,
+            e.g. when fns read `paper.details`
+          select: Ask API v1 for only the fields the filters and extractor read
+          server_search: Narrow venues with the search endpoint; papers then
+            come without replies, so it cannot be combined with them
+          keep_raw: Keep the full notes instead of only what records hold;
+            the note attributes the extractor reads are always kept
+        """
+        if replies is None:
+            replies = "details" in extractor.fields or "details" in extractor.subfields
+        if replies and server_search:
+            raise ValueError(
+                "server_search returns papers without replies (details); "
+                "drop server_search or the replies"
+            )
+        fields = None
+        if select:
+            content_fields = FILTER_FIELDS + extractor.subfields.get("content", [])
+            fields = ["id", "forum", "number", "tcdate", "tmdate", "invitation"]
+            fields += [field for field in extractor.fields if field not in fields]
+            fields += [f"content.{field}" for field in dict.fromkeys(content_fields)]
+            fields = ",".join(fields)
+        return cls(
+            details="directReplies" if replies else None,
+            select=fields,
+            search_terms=flatten_keywords(keywords) if server_search else None,
+            keep_raw=keep_raw,
+            attributes=tuple(extractor.fields),
+        )
+
+    def normalize(self, notes, api_version):
+        """
+        Iterable of the notes as the run keeps them: PaperRecords, or the
+        notes themselves if records are off.
+        """
+        if not self.records:
+            return notes
+        return to_records(notes, api_version, self.keep_raw, self.attributes)
+
+    def queries(self, venue, only_accepted):
+        """
+        Returns a list of keyword arguments for `get_all_notes`, or of
+        `{"search": ...}` queries when searching on the server.
+        """
+        if self.search_terms:
+            return [
+                {
+                    "search": {
+                        "term": term,
+                        "venue": venue,
+                        "only_accepted": only_accepted,
+                        "limit": self.search_limit,
+                    }
+                }
+                for term in self.search_terms
+            ]
+        if only_accepted:
+            queries = [{"content": {"venueid": venue}}]
+        else:
+            queries = [
+                {"invitation": f"{venue}/-/Submission"},
+                {"invitation": f"{venue}/-/Blind_Submission"},
+            ]
+        for query in queries:
+            if self.details is not None:
+                query["details"] = self.details
+            if self.select is not None:
+                query["select"] = self.select
+        return queries
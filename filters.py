@@ -1,4 +1,7 @@
+import time
+
 from thefuzz import fuzz
+from rapidfuzz import fuzz as rf_fuzz, process
 
 
 def check_keywords_with_keywords(keywords, paper_keywords, threshold):
@@ -156,3 +159,314 @@ def abstract_filter(paper, keywords, threshold=85):
     if paper_abstract is not None:
         return check_keywords_with_text(keywords, paper_abstract, threshold)
     return None, False
+
+
+def normalize_keyword(keyword):
+    """
+    Normalise a keyword the way the check functions do, None if it is skipped.
+    """
+    if keyword is None:
+        return None
+    keyword = str(keyword)
+    if not keyword.strip():
+        return None
+    return keyword
+
+
+def normalize_text(text):
+    if text is None:
+        return None
+    text = str(text)
+    if not text.strip():
+        return None
+    return text
+
+
+def normalize_paper_keywords(paper_keywords):
+    if not paper_keywords:
+        return []
+    if not isinstance(paper_keywords, list):
+        if isinstance(paper_keywords, str):
+            paper_keywords = [paper_keywords]
+        else:
+            try:
+                paper_keywords = list(paper_keywords)
+            except:
+                paper_keywords = [str(paper_keywords)]
+    return [
+        str(paper_keyword)
+        for paper_keyword in paper_keywords
+        if paper_keyword is not None and str(paper_keyword).strip()
+    ]
+
+
+# seconds one evaluation of a built-in filter is assumed to take until it has
+# been timed: keyword lists are short, abstracts are long
+FIELD_COSTS = {"keywords": 2e-6, "title": 1e-5, "abstract": 1e-4}
+DEFAULT_FILTER_COST = 1e-4
+
+
+class FilterPlanner:
+    """
+    Cost and pass-rate estimates of the filters of a KeywordMatcher, and the
+    evaluation orders that follow from them.
+
+    A filter's cost starts from a prior, its `cost` attribute in seconds if
+    it has one, and becomes the mean time of its evaluations as they are
+    timed. Pass rates of filters and MIX keyword groups start at 1/2. The
+    orders are recomputed every `replan_every` papers; they only change how
+    fast a paper is rejected, never what `match` returns.
+
+    Args:
+      priors: Prior cost in seconds of each filter
+      n_groups: Number of MIX keyword groups
+      prior_weight: Number of timed evaluations the prior counts as
+      replan_every: Papers between recomputing the orders
+    """
+
+    def __init__(self, priors, n_groups=0, prior_weight=10, replan_every=256):
+        n_filters = len(priors)
+        self.priors = list(priors)
+        self.prior_weight = prior_weight
+        self.replan_every = replan_every
+        self.seconds = [0.0] * n_filters
+        self.timed = [0] * n_filters
+        self.passed = [0] * n_filters
+        self.evaluated = [0] * n_filters
+        self.group_passed = [0] * n_groups
+        self.group_evaluated = [0] * n_groups
+        self.n_papers = 0
+        self.replan()
+
+    def cost(self, idx):
+        weight = self.prior_weight
+        return (self.priors[idx] * weight + self.seconds[idx]) / (
+            weight + self.timed[idx]
+        )
+
+    def pass_rate(self, idx):
+        return (self.passed[idx] + 1) / (self.evaluated[idx] + 2)
+
+    def group_pass_rate(self, group_idx):
+        return (self.group_passed[group_idx] + 1) / (
+            self.group_evaluated[group_idx] + 2
+        )
+
+    def record_time(self, idx, seconds):
+        self.seconds[idx] += seconds
+        self.timed[idx] += 1
+
+    def record(self, idx, passed):
+        self.passed[idx] += passed
+        self.evaluated[idx] += 1
+
+    def record_group(self, group_idx, passed):
+        self.group_passed[group_idx] += passed
+        self.group_evaluated[group_idx] += 1
+
+    def replan(self):
+        filter_idxs = range(len(self.priors))
+        # every filter must pass: cheapest per chance of rejecting first
+        self.reject_order = sorted(
+            filter_idxs, key=lambda idx: self.cost(idx) / (1 - self.pass_rate(idx))
+        )
+        # any filter may pass: cheapest per chance of passing first
+        self.accept_order = sorted(
+            filter_idxs, key=lambda idx: self.cost(idx) / self.pass_rate(idx)
+        )
+        # every group must pass: the groups most likely to fail first
+        self.group_order = sorted(
+            range(len(self.group_passed)), key=self.group_pass_rate
+        )
+
+    def tick(self):
+        self.n_papers += 1
+        if self.n_papers % self.replan_every == 0:
+            self.replan()
+
+
+class KeywordMatcher:
+    """
+    Compiled form of `satisfies_{any,all,mixed}_filters` for a fixed keyword
+    list and filter list.
+
+    Keywords are normalised once when the matcher is built, and each paper's
+    title, abstract and keywords are normalised once per paper. The built-in
+    filters score all keywords against a field in a single rapidfuzz batch.
+    Any other filter is called as before, at most once per keyword list
+    and paper. `match` returns the same output as the `satisfies_*`
+    function for `filter_mode`.
+
+    In AND and MIX modes, whether a paper matches at all is decided first,
+    with the filters (and MIX groups) in the order of a FilterPlanner, so
+    a paper missing a cheap field is rejected before its abstract is
+    scored. Only matching papers are then walked in registration order to
+    pick the keywords and filter types reported.
+    """
+
+    def __init__(self, keywords, filters, filter_mode="OR"):
+        self.keywords = keywords
+        self.filters = filters
+        self.filter_mode = filter_mode.upper()
+        if self.filter_mode == "MIX":
+            self.groups = [
+                group if isinstance(group, list) else [group] for group in keywords
+            ]
+            flat_keywords = [kw for group in self.groups for kw in group]
+        else:
+            self.groups = None
+            flat_keywords = list(keywords)
+        self.normalized = {}
+        for kw in flat_keywords:
+            self.normalized.setdefault(self._key(kw), normalize_keyword(kw))
+        self.specs = [self._compile_filter(f, a, k) for f, a, k in filters]
+        self.planner = FilterPlanner(
+            [
+                getattr(
+                    filter_,
+                    "cost",
+                    FIELD_COSTS[spec[0]] if spec is not None else DEFAULT_FILTER_COST,
+                )
+                for (filter_, _, _), spec in zip(filters, self.specs)
+            ],
+            n_groups=len(self.groups or []),
+        )
+
+    def __call__(self, paper):
+        return self.match(paper)
+
+    def _key(self, keyword):
+        # keywords may be unhashable (e.g. nested lists in OR mode)
+        return repr(keyword)
+
+    def _compile_filter(self, filter_, args, kwargs):
+        builtin = {
+            keywords_filter: ("keywords", rf_fuzz.ratio),
+            title_filter: ("title", rf_fuzz.partial_ratio),
+            abstract_filter: ("abstract", rf_fuzz.partial_ratio),
+        }.get(filter_)
+        if builtin is None or len(args) > 1 or set(kwargs) - {"threshold"}:
+            return None
+        field, scorer = builtin
+        threshold = args[0] if args else kwargs.get("threshold", 85)
+        return field, scorer, threshold
+
+    def _field(self, paper, field, state):
+        if field not in state["fields"]:
+            value = paper.content.get(field)
+            if field == "keywords":
+                normalized = normalize_paper_keywords(value)
+            else:
+                normalized = normalize_text(value)
+            state["fields"][field] = normalized
+        return state["fields"][field]
+
+    def _score(self, paper, idx, state, keywords):
+        """
+        Whether the idx-th built-in filter matches each normalised keyword.
+        Keywords are scored against the field in one rapidfuzz batch, and
+        only once per paper.
+        """
+        scores = state["scores"].setdefault(idx, {})
+        missing = [
+            kw for kw in dict.fromkeys(keywords) if kw is not None and kw not in scores
+        ]
+        if missing:
+            start = time.perf_counter()
+            field, scorer, threshold = self.specs[idx]
+            value = self._field(paper, field, state)
+            for kw in missing:
+                scores[kw] = False
+            if value:
+                choices = value if field == "keywords" else [value]
+                for choice in choices:
+                    for kw, score, _ in process.extract(
+                        choice, missing, scorer=scorer, limit=None
+                    ):
+                        if int(round(score)) >= threshold:
+                            scores[kw] = True
+            self.planner.record_time(idx, time.perf_counter() - start)
+        return scores
+
+    def _first_match(self, paper, idx, keywords, state):
+        filter_, args, kwargs = self.filters[idx]
+        if self.specs[idx] is None:
+            key = (idx, self._key(keywords))
+            if key not in state["calls"]:
+                start = time.perf_counter()
+                state["calls"][key] = filter_(paper, keywords=keywords, *args, **kwargs)
+                self.planner.record_time(idx, time.perf_counter() - start)
+            return state["calls"][key]
+        normalized = [self.normalized[self._key(kw)] for kw in keywords]
+        scores = self._score(paper, idx, state, normalized)
+        for kw in normalized:
+            if kw is not None and scores[kw]:
+                return kw, True
+        return None, False
+
+    def _group_matches(self, paper, idx, group, state):
+        """
+        Whether the idx-th filter matches any keyword of a MIX group.
+        """
+        if self.specs[idx] is None:
+            return any(self._first_match(paper, idx, [kw], state)[1] for kw in group)
+        return self._first_match(paper, idx, group, state)[1]
+
+    def match(self, paper):
+        """
+        Returns:
+          Tuple of (matched keyword(s), filter type(s), satisfies)
+        """
+        state = {"fields": {}, "scores": {}, "calls": {}}
+        self.planner.tick()
+        if self.filter_mode == "AND":
+            for idx in self.planner.reject_order:
+                _, matched = self._first_match(paper, idx, self.keywords, state)
+                self.planner.record(idx, matched)
+                if not matched:
+                    return None, None, False
+            matched_keywords = []
+            filter_types = []
+            for idx, (filter_, _, _) in enumerate(self.filters):
+                keyword, _ = self._first_match(paper, idx, self.keywords, state)
+                filter_types.append(filter_.__name__)
+                matched_keywords.append(keyword)
+            return matched_keywords, filter_types, True
+        if self.filter_mode == "MIX":
+            for group_idx in self.planner.group_order:
+                group_matched = False
+                for idx in self.planner.accept_order:
+                    matched = self._group_matches(
+                        paper, idx, self.groups[group_idx], state
+                    )
+                    self.planner.record(idx, matched)
+                    if matched:
+                        group_matched = True
+                        break
+                self.planner.record_group(group_idx, group_matched)
+                if not group_matched:
+                    return None, None, False
+            # every group matches: report the first keyword and filter of
+            # each, in registration order; results computed above are reused
+            matched_keywords = []
+            filter_types = []
+            for group in self.groups:
+                group_matched = False
+                for kw in group:
+                    for idx, (filter_, _, _) in enumerate(self.filters):
+                        keyword, matched = self._first_match(paper, idx, [kw], state)
+                        if matched:
+                            matched_keywords.append(keyword)
+                            filter_types.append(filter_.__name__)
+                            group_matched = True
+                            break
+                    if group_matched:
+                        break
+                if not group_matched:
+                    return None, None, False
+            return matched_keywords, filter_types, True
+        for idx, (filter_, _, _) in enumerate(self.filters):
+            keyword, matched = self._first_match(paper, idx, self.keywords, state)
+            if matched:
+                return keyword, filter_.__name__, True
+        return None, None, False
@@ -0,0 +1,40 @@
+import sqlite3
+import time
+
+
+class ForumIndex:
+    """
+    Persistent set of forum IDs already exported to an output file, stored
+    in an SQLite table next to it (`<fpath>.forums.sqlite`).
+
+    The IDs are loaded into memory once, so membership checks cost a set
+    lookup and papers exported by an earlier run can be dropped before any
+    scoring, enrichment or writing.
+    """
+
+    def __init__(self, fpath):
+        self.path = f"{fpath}.forums.sqlite"
+        self.conn = sqlite3.connect(self.path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS forums (forum TEXT PRIMARY KEY, exported_at REAL)"
+        )
+        self.forums = {row[0] for row in self.conn.execute("SELECT forum FROM forums")}
+
+    def __contains__(self, forum_id):
+        return forum_id in self.forums
+
+    def __len__(self):
+        return len(self.forums)
+
+    def add(self, forum_ids):
+        new_ids = [forum_id for forum_id in forum_ids if forum_id not in self.forums]
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO forums VALUES (?, ?)",
+                [(forum_id, now) for forum_id in new_ids],
+            )
+        self.forums.update(new_ids)
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,246 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# upper bounds in seconds, shared by every histogram
+BUCKETS = (
+    0.0001,
+    0.0005,
+    0.001,
+    0.005,
+    0.01,
+    0.05,
+    0.1,
+    0.5,
+    1.0,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    float("inf"),
+)
+
+
+def label_key(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def format_labels(key):
+    if not key:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in key) + "}"
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "buckets": {str(bound): n for bound, n in zip(BUCKETS, self.counts)},
+        }
+
+
+class Metrics:
+    """
+    Thread-safe counters, gauges and histograms with labels.
+
+    Timers are histograms of seconds: `with metrics.timer("fetch_seconds",
+    venue=venue): ...`. Everything can be exported as JSON or in the
+    Prometheus text format.
+    """
+
+    def __init__(self, prefix="openreview_scraper"):
+        self.prefix = prefix
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, **labels):
+        key = label_key(labels)
+        with self._lock:
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self.gauges.setdefault(name, {})[label_key(labels)] = value
+
+    def observe(self, name, value, **labels):
+        key = label_key(labels)
+        with self._lock:
+            series = self.histograms.setdefault(name, {})
+            if key not in series:
+                series[key] = Histogram()
+            series[key].observe(value)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def value(self, name, **labels):
+        """
+        Current value of a counter or gauge, or (count, sum) of a histogram.
+        """
+        key = label_key(labels)
+        if name in self.counters:
+            return self.counters[name].get(key, 0)
+        if name in self.gauges:
+            return self.gauges[name].get(key)
+        histogram = self.histograms.get(name, {}).get(key)
+        return (histogram.count, histogram.sum) if histogram else (0, 0.0)
+
+    def to_dict(self):
+        def series(metric, convert=lambda value: value):
+            return [
+                {"labels": dict(key), "value": convert(value)}
+                for key, value in metric.items()
+            ]
+
+        with self._lock:
+            return {
+                "counters": {
+                    name: series(metric) for name, metric in self.counters.items()
+                },
+                "gauges": {
+                    name: series(metric) for name, metric in self.gauges.items()
+                },
+                "histograms": {
+                    name: series(metric, Histogram.to_dict)
+                    for name, metric in self.histograms.items()
+                },
+            }
+
+    def save_json(self, fpath):
+        with open(fpath, "w") as fp:
+            json.dump(self.to_dict(), fp, indent=2)
+
+    def to_prometheus(self):
+        lines = []
+        with self._lock:
+            for name, metric in self.counters.items():
+                full_name = f"{self.prefix}_{name}"
+                lines.append(f"# TYPE {full_name} counter")
+                for key, value in metric.items():
+                    lines.append(f"{full_name}{format_labels(key)} {value}")
+            for name, metric in self.gauges.items():
+                full_name = f"{self.prefix}_{name}"
+                lines.append(f"# TYPE {full_name} gauge")
+                for key, value in metric.items():
+                    lines.append(f"{full_name}{format_labels(key)} {value}")
+            for name, metric in self.histograms.items():
+                full_name = f"{self.prefix}_{name}"
+                lines.append(f"# TYPE {full_name} histogram")
+                for key, histogram in metric.items():
+                    cumulative = 0
+                    for bound, n in zip(BUCKETS, histogram.counts):
+                        cumulative += n
+                        le = "+Inf" if bound == float("inf") else repr(bound)
+                        bucket_key = key + (("le", le),)
+                        lines.append(
+                            f"{full_name}_bucket{format_labels(bucket_key)} {cumulative}"
+                        )
+                    lines.append(f"{full_name}_sum{format_labels(key)} {histogram.sum}")
+                    lines.append(
+                        f"{full_name}_count{format_labels(key)} {histogram.count}"
+                    )
+        return "\n".join(lines) + "\n"
+
+    def save_prometheus(self, fpath):
+        """
+        Write the metrics in the Prometheus text format, e.g. for the
+        node_exporter textfile collector.
+        """
+        tmp_path = f"{fpath}.tmp"
+        with open(tmp_path, "w") as fp:
+            fp.write(self.to_prometheus())
+        os.replace(tmp_path, fpath)
+
+
+class NullMetrics(Metrics):
+    """
+    Metrics that records nothing, used when no Metrics is given.
+    """
+
+    def inc(self, name, value=1, **labels):
+        pass
+
+    def set(self, name, value, **labels):
+        pass
+
+    def observe(self, name, value, **labels):
+        pass
+
+
+NULL_METRICS = NullMetrics()
+
+
+class ProgressReporter:
+    """
+    Receives the scraper's progress messages. Subclass it to send progress
+    elsewhere (a logger, a progress bar); this base class is silent.
+    """
+
+    def stage(self, name):
+        pass
+
+    def venue(self, venue, n_papers):
+        pass
+
+    def info(self, message):
+        pass
+
+    def error(self, message):
+        pass
+
+
+class PrintReporter(ProgressReporter):
+    """
+    Prints progress to stdout, as the scraper always has.
+    """
+
+    def stage(self, name):
+        print(f"{name}...")
+
+    def venue(self, venue, n_papers):
+        print(venue)
+        print(f"Number of papers: {n_papers}")
+
+    def info(self, message):
+        print(message)
+
+    def error(self, message):
+        print(message)
+
+
+class QuietReporter(ProgressReporter):
+    """
+    Prints errors only.
+    """
+
+    def error(self, message):
+        print(message)
+
+
+PRINT_REPORTER = PrintReporter()
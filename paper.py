@@ -1,4 +1,126 @@
-def get_grouped_venue_papers(clients, grouped_venue, only_accepted):
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from fetch_profile import FetchProfile
+from metrics import NULL_METRICS, PRINT_REPORTER
+from utils import unwrap_value
+
+
+def get_venue_queries(venue, only_accepted, profile=None):
+    """
+    Build the note queries needed to fetch the papers of a venue.
+
+    Args:
+      venue: Venue ID
+      only_accepted: Boolean to filter only accepted papers
+      profile: FetchProfile deciding details/select/search, None to request
+        every note with its direct replies
+
+    Returns:
+      List of keyword arguments for `get_all_notes`
+    """
+    if profile is None:
+        profile = FetchProfile()
+    return profile.queries(venue, only_accepted)
+
+
+def note_in_venue(note, venue, only_accepted):
+    if only_accepted:
+        return unwrap_value(note.content.get("venueid")) == venue
+    invitations = getattr(note, "invitations", None) or [
+        getattr(note, "invitation", None)
+    ]
+    return bool(
+        {f"{venue}/-/Submission", f"{venue}/-/Blind_Submission"} & set(invitations)
+    )
+
+
+def search_notes(client, term, venue, only_accepted, limit=1000):
+    """
+    Papers of a venue matching a search term, using the server's search
+    endpoint instead of listing the whole venue.
+    """
+    group = venue.split("/")[0]
+    notes = []
+    offset = 0
+    while True:
+        page = client.search_notes(
+            term, content="all", group=group, source="forum", limit=limit, offset=offset
+        )
+        notes += [note for note in page if note_in_venue(note, venue, only_accepted)]
+        if len(page) < limit:
+            return notes
+        offset += limit
+
+
+def api_query(query, api_version):
+    if api_version != 1:
+        # select is only sent to API v1
+        return {k: v for k, v in query.items() if k != "select"}
+    return query
+
+
+def fetch_notes(client, api_version, venue, query, cache=None):
+    """
+    Run a note query, going through the note cache when one is given.
+    """
+    if "search" in query:
+        return search_notes(client, **query["search"])
+    query = api_query(query, api_version)
+    if cache is None:
+        return client.get_all_notes(**query)
+    return cache.get_all_notes(client, api_version, venue, query)
+
+
+def iter_notes(client, query, limit=1000):
+    """
+    Yield the notes of a query page by page instead of collecting them all,
+    paging with the same id cursor `get_all_notes` uses.
+    """
+    params = dict(query, sort="id", limit=limit)
+    while True:
+        page = client.get_notes(**params)
+        yield from page
+        if len(page) < limit:
+            return
+        params["after"] = page[-1].id
+
+
+def normalize_notes(notes, api_version, profile=None):
+    """
+    List of fetched notes as the profile keeps them (see FetchProfile.normalize);
+    unchanged without a profile.
+    """
+    if profile is None:
+        return notes
+    return list(profile.normalize(notes, api_version))
+
+
+def merge_submissions(submissions_v1, submissions_v2):
+    """
+    Merge submissions from both APIs, using forum IDs to avoid duplicates.
+    """
+    forum_ids = set()
+    merged_submissions = []
+
+    for submission in submissions_v1 + submissions_v2:
+        if hasattr(submission, "forum") and submission.forum not in forum_ids:
+            forum_ids.add(submission.forum)
+            merged_submissions.append(submission)
+
+    return merged_submissions
+
+
+def get_grouped_venue_papers(
+    clients,
+    grouped_venue,
+    only_accepted,
+    cache=None,
+    profile=None,
+    failures=None,
+    metrics=None,
+    reporter=None,
+):
     """
     Get papers from both API v1 and API v2 clients and merge the results.
 
@@ -6,75 +128,167 @@ def get_grouped_venue_papers(clients, grouped_venue, only_accepted):
       clients: Tuple of (client_v1, client_v2)
       grouped_venue: List of venue IDs
       only_accepted: Boolean to filter only accepted papers
+      cache: Optional NoteCache to read notes from
+      profile: Optional FetchProfile deciding what the queries request
+      failures: Optional FailureLog recording the venues that could not be fetched
+      metrics: Optional Metrics recording fetch times and note counts
+      reporter: Optional ProgressReporter, by default progress is printed
 
     Returns:
       Dictionary of papers by venue
     """
     client_v1, client_v2 = clients
+    metrics = metrics or NULL_METRICS
+    reporter = reporter or PRINT_REPORTER
     papers = {}
 
     for venue in grouped_venue:
         papers[venue] = []
+        queries = get_venue_queries(venue, only_accepted, profile)
 
         # Get papers from API v1
         submissions_v1 = []
         try:
-            if only_accepted:
-                submissions_v1 = client_v1.get_all_notes(
-                    content={"venueid": venue}, details="directReplies"
-                )
-            else:
-                single_blind_submissions = client_v1.get_all_notes(
-                    invitation=f"{venue}/-/Submission", details="directReplies"
-                )
-                double_blind_submissions = client_v1.get_all_notes(
-                    invitation=f"{venue}/-/Blind_Submission", details="directReplies"
-                )
-                submissions_v1 = single_blind_submissions + double_blind_submissions
+            with metrics.timer("fetch_seconds", venue=venue, api="v1"):
+                for query in queries:
+                    submissions_v1 += normalize_notes(
+                        fetch_notes(client_v1, 1, venue, query, cache), 1, profile
+                    )
+            metrics.inc("notes_fetched", len(submissions_v1), venue=venue, api="v1")
         except Exception as e:
-            print(f"Error getting papers from API v1 for venue {venue}: {e}")
+            submissions_v1 = []
+            reporter.error(f"Error getting papers from API v1 for venue {venue}: {e}")
+            if failures is not None:
+                failures.record("venue", venue, e, api_version=1)
 
         # Get papers from API v2
         submissions_v2 = []
         try:
-            if only_accepted:
-                submissions_v2 = client_v2.get_all_notes(
-                    content={"venueid": venue}, details="directReplies"
-                )
-            else:
-                single_blind_submissions = client_v2.get_all_notes(
-                    invitation=f"{venue}/-/Submission", details="directReplies"
-                )
-                double_blind_submissions = client_v2.get_all_notes(
-                    invitation=f"{venue}/-/Blind_Submission", details="directReplies"
-                )
-                submissions_v2 = single_blind_submissions + double_blind_submissions
+            with metrics.timer("fetch_seconds", venue=venue, api="v2"):
+                for query in queries:
+                    submissions_v2 += normalize_notes(
+                        fetch_notes(client_v2, 2, venue, query, cache), 2, profile
+                    )
+            metrics.inc("notes_fetched", len(submissions_v2), venue=venue, api="v2")
         except Exception as e:
-            print(f"Error getting papers from API v2 for venue {venue}: {e}")
-
-        # Merge submissions from both APIs
-        # Use forum IDs to avoid duplicates
-        forum_ids = set()
-        merged_submissions = []
-
-        for submission in submissions_v1 + submissions_v2:
-            if hasattr(submission, "forum") and submission.forum not in forum_ids:
-                forum_ids.add(submission.forum)
-                # Add BibTeX here
-                # Try to get venue name from venue string, fallback to "OpenReview"
-                venue_name = venue.split("/")[0] if "/" in venue else "OpenReview"
-                # submission.content["bibtex"] = fetch_bibtex_from_html(submission.forum)
-                merged_submissions.append(submission)
+            submissions_v2 = []
+            reporter.error(f"Error getting papers from API v2 for venue {venue}: {e}")
+            if failures is not None:
+                failures.record("venue", venue, e, api_version=2)
 
+        merged_submissions = merge_submissions(submissions_v1, submissions_v2)
         papers[venue] += merged_submissions
 
-        print(venue)
-        print(f"Number of papers: {len(merged_submissions)}")
+        reporter.venue(venue, len(merged_submissions))
+
+    return papers
+
+
+def get_papers_concurrently(
+    clients,
+    grouped_venues,
+    only_accepted,
+    max_workers,
+    max_per_host=None,
+    cache=None,
+    profile=None,
+    failures=None,
+    metrics=None,
+    reporter=None,
+):
+    """
+    Get papers for all grouped venues, running every v1/v2 query in parallel.
+
+    Each (venue, API version, query) is an independent task submitted to a
+    bounded thread pool. Results are merged in the same order as the
+    sequential path, so the output is identical to `get_papers` with
+    `max_workers=1`.
+
+    Args:
+      clients: Tuple of (client_v1, client_v2)
+      grouped_venues: Dictionary of venue IDs by group
+      only_accepted: Boolean to filter only accepted papers
+      max_workers: Number of worker threads
+      max_per_host: Maximum number of in-flight requests per API host,
+        None for no limit beyond max_workers
+      cache: Optional NoteCache to read notes from
+      profile: Optional FetchProfile deciding what the queries request
+      failures: Optional FailureLog recording the venues that could not be fetched
+      metrics: Optional Metrics recording fetch times and note counts
+      reporter: Optional ProgressReporter, by default progress is printed
+
+    Returns:
+      Dictionary of papers by group and venue
+    """
+    metrics = metrics or NULL_METRICS
+    reporter = reporter or PRINT_REPORTER
+    host_limits = {}
+    for client in clients:
+        host = getattr(client, "baseurl", id(client))
+        if host not in host_limits:
+            host_limits[host] = threading.BoundedSemaphore(max_per_host or max_workers)
+
+    def fetch(client, api_version, venue, query):
+        host = getattr(client, "baseurl", id(client))
+        with host_limits[host]:
+            with metrics.timer("fetch_seconds", venue=venue, api=f"v{api_version}"):
+                notes = normalize_notes(
+                    fetch_notes(client, api_version, venue, query, cache),
+                    api_version,
+                    profile,
+                )
+        metrics.inc("notes_fetched", len(notes), venue=venue, api=f"v{api_version}")
+        return notes
+
+    futures = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for group, grouped_venue in grouped_venues.items():
+            for venue in grouped_venue:
+                for api_idx, client in enumerate(clients):
+                    futures[(group, venue, api_idx)] = [
+                        executor.submit(fetch, client, api_idx + 1, venue, query)
+                        for query in get_venue_queries(venue, only_accepted, profile)
+                    ]
+
+        papers = {}
+        for group, grouped_venue in grouped_venues.items():
+            papers[group] = {}
+            for venue in grouped_venue:
+                submissions = []
+                for api_idx in range(len(clients)):
+                    api_submissions = []
+                    try:
+                        for future in futures[(group, venue, api_idx)]:
+                            api_submissions += future.result()
+                    except Exception as e:
+                        api_submissions = []
+                        reporter.error(
+                            f"Error getting papers from API v{api_idx + 1} for venue {venue}: {e}"
+                        )
+                        if failures is not None:
+                            failures.record("venue", venue, e, api_version=api_idx + 1)
+                    submissions.append(api_submissions)
+
+                merged_submissions = merge_submissions(*submissions)
+                papers[group][venue] = merged_submissions
+
+                reporter.venue(venue, len(merged_submissions))
 
     return papers
 
 
-def get_papers(clients, grouped_venues, only_accepted):
+def get_papers(
+    clients,
+    grouped_venues,
+    only_accepted,
+    max_workers=1,
+    max_per_host=None,
+    cache=None,
+    profile=None,
+    failures=None,
+    metrics=None,
+    reporter=None,
+):
     """
     Get papers for all grouped venues.
 
@@ -82,11 +296,106 @@ def get_papers(clients, grouped_venues, only_accepted):
       clients: Tuple of (client_v1, client_v2)
       grouped_venues: Dictionary of venue IDs by group
       only_accepted: Boolean to filter only accepted papers
+      max_workers: Number of worker threads; 1 fetches venues one at a time
+      max_per_host: Maximum number of in-flight requests per API host
+      cache: Optional NoteCache to read notes from
+      profile: Optional FetchProfile deciding what the queries request
+      failures: Optional FailureLog recording the venues that could not be fetched
+      metrics: Optional Metrics recording fetch times and note counts
+      reporter: Optional ProgressReporter, by default progress is printed
 
     Returns:
       Dictionary of papers by group and venue
     """
+    if max_workers > 1:
+        return get_papers_concurrently(
+            clients,
+            grouped_venues,
+            only_accepted,
+            max_workers,
+            max_per_host,
+            cache,
+            profile,
+            failures,
+            metrics,
+            reporter,
+        )
     papers = {}
     for group, grouped_venue in grouped_venues.items():
-        papers[group] = get_grouped_venue_papers(clients, grouped_venue, only_accepted)
+        papers[group] = get_grouped_venue_papers(
+            clients,
+            grouped_venue,
+            only_accepted,
+            cache,
+            profile,
+            failures,
+            metrics,
+            reporter,
+        )
     return papers
+
+
+def iter_papers(
+    clients,
+    grouped_venues,
+    only_accepted,
+    cache=None,
+    profile=None,
+    failures=None,
+    metrics=None,
+    reporter=None,
+    limit=1000,
+):
+    """
+    Stream papers for all grouped venues as they are fetched.
+
+    Notes are deduplicated by forum within each venue, like `get_papers`.
+    Unlike `get_papers`, a query that fails part way keeps the notes it
+    already yielded.
+
+    Args:
+      clients: Tuple of (client_v1, client_v2)
+      grouped_venues: Dictionary of venue IDs by group
+      only_accepted: Boolean to filter only accepted papers
+      cache: Optional NoteCache to read notes from
+      profile: Optional FetchProfile deciding what the queries request
+      failures: Optional FailureLog recording the venues that could not be fetched
+      metrics: Optional Metrics recording fetch times and note counts
+      reporter: Optional ProgressReporter, by default progress is printed
+      limit: Page size
+
+    Yields:
+      Tuples of (group, venue, paper)
+    """
+    metrics = metrics or NULL_METRICS
+    reporter = reporter or PRINT_REPORTER
+    for group, grouped_venue in grouped_venues.items():
+        for venue in grouped_venue:
+            forum_ids = set()
+            for api_idx, client in enumerate(clients):
+                try:
+                    for query in get_venue_queries(venue, only_accepted, profile):
+                        if cache is None and "search" not in query:
+                            notes = iter_notes(
+                                client, api_query(query, api_idx + 1), limit
+                            )
+                        else:
+                            notes = fetch_notes(
+                                client, api_idx + 1, venue, query, cache
+                            )
+                        if profile is not None:
+                            notes = profile.normalize(notes, api_idx + 1)
+                        for note in notes:
+                            metrics.inc(
+                                "notes_fetched", venue=venue, api=f"v{api_idx + 1}"
+                            )
+                            if hasattr(note, "forum") and note.forum not in forum_ids:
+                                forum_ids.add(note.forum)
+                                yield group, venue, note
+                except Exception as e:
+                    reporter.error(
+                        f"Error getting papers from API v{api_idx + 1} for venue {venue}: {e}"
+                    )
+                    if failures is not None:
+                        failures.record("venue", venue, e, api_version=api_idx + 1)
+            reporter.venue(venue, len(forum_ids))
@@ -0,0 +1,109 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from filters import KeywordMatcher
+from prefilter import KeywordPrefilter
+
+VIEW_FIELDS = ("title", "abstract", "keywords")
+
+
+class PaperView:
+    """
+    Picklable stand-in for a note, holding only what the filters read.
+    """
+
+    __slots__ = ("id", "forum", "content")
+
+    def __init__(self, id, forum, content):
+        self.id = id
+        self.forum = forum
+        self.content = content
+
+    @classmethod
+    def from_paper(cls, paper, fields=VIEW_FIELDS):
+        content = {field: paper.content.get(field) for field in fields}
+        return cls(getattr(paper, "id", None), getattr(paper, "forum", None), content)
+
+
+_matcher = None
+_prefilter = None
+
+
+def _init_worker(keywords, filters, filter_mode, prefilter):
+    global _matcher, _prefilter
+    _matcher = KeywordMatcher(keywords, filters, filter_mode)
+    _prefilter = KeywordPrefilter(_matcher) if prefilter else None
+
+
+def _match_chunk(chunk):
+    matches = []
+    for pos, view in chunk:
+        if _prefilter is not None and not _prefilter.may_match(view):
+            continue
+        keyword, filter_type, satisfies = _matcher.match(view)
+        if satisfies:
+            matches.append((pos, keyword, filter_type))
+    return matches
+
+
+def filter_papers_parallel(
+    papers,
+    keywords,
+    filters,
+    filter_mode,
+    n_jobs,
+    chunk_size=500,
+    prefilter=False,
+    fields=VIEW_FIELDS,
+):
+    """
+    Run the filter stage over all papers in a process pool.
+
+    Papers are shipped to the workers as PaperView objects, so filters
+    (including custom ones) must be picklable module-level functions and
+    may only read `id`, `forum` and the content `fields`.
+
+    Args:
+      papers: Dictionary of papers by group and venue
+      keywords: Keywords as given to the Scraper
+      filters: List of (filter_, args, kwargs) tuples
+      filter_mode: 'OR', 'AND' or 'MIX'
+      n_jobs: Number of worker processes
+      chunk_size: Number of papers sent to a worker at a time
+      prefilter: Run KeywordPrefilter before fuzzy scoring
+      fields: Content fields copied into each PaperView
+
+    Returns:
+      Dictionary by group and venue of (paper, matched keyword(s),
+      filter type(s)) tuples, in the original paper order
+    """
+    units = []
+    chunks = []
+    chunk = []
+    for group, grouped_venues in papers.items():
+        for venue, venue_papers in grouped_venues.items():
+            units.append((group, venue))
+            for paper_idx, paper in enumerate(venue_papers):
+                pos = (len(units) - 1, paper_idx)
+                chunk.append((pos, PaperView.from_paper(paper, fields)))
+                if len(chunk) == chunk_size:
+                    chunks.append(chunk)
+                    chunk = []
+    if chunk:
+        chunks.append(chunk)
+
+    matched = {}
+    for group, grouped_venues in papers.items():
+        matched[group] = {venue: [] for venue in grouped_venues}
+
+    with ProcessPoolExecutor(
+        max_workers=n_jobs,
+        initializer=_init_worker,
+        initargs=(keywords, filters, filter_mode, prefilter),
+    ) as executor:
+        # map yields chunk results in submission order, which keeps the merge deterministic
+        for chunk_matches in executor.map(_match_chunk, chunks):
+            for (unit_idx, paper_idx), keyword, filter_type in chunk_matches:
+                group, venue = units[unit_idx]
+                paper = papers[group][venue][paper_idx]
+                matched[group][venue].append((paper, keyword, filter_type))
+    return matched
@@ -0,0 +1,192 @@
+import hashlib
+import json
+import os
+import threading
+
+from transport import default_session
+
+
+def sha256_file(path, chunk_size=1 << 16):
+    digest = hashlib.sha256()
+    with open(path, "rb") as fp:
+        for chunk in iter(lambda: fp.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DownloadError(Exception):
+    """
+    A PDF could not be downloaded; the message says why.
+    """
+
+
+class PDFStore:
+    """
+    Folder of `<forum>.pdf` files with a manifest of what has been downloaded.
+
+    Responses are streamed to `<forum>.pdf.part` in chunks and renamed once
+    complete, so a crash never leaves a truncated PDF under its final name.
+    Forums already in the manifest (and still on disk with the recorded size)
+    are skipped. A leftover `.part` file is resumed with a Range request,
+    guarded by If-Range on its ETag; a 416 answer to that request means the
+    `.part` file is already complete. The manifest also records each file's
+    sha256, size and ETag.
+
+    The manifest is an append-only log (`manifest.jsonl`) with one line per
+    update, so recording a download costs the same however many PDFs are
+    stored; it is compacted to one line per forum when the store is opened.
+
+    Args:
+      root: Folder the PDFs are stored in
+      chunk_size: Bytes read from the response at a time
+    """
+
+    def __init__(self, root="pdfs", chunk_size=1 << 16):
+        self.root = root
+        self.chunk_size = chunk_size
+        self.manifest_path = os.path.join(root, "manifest.jsonl")
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self.manifest = self._load_manifest()
+        self._save_manifest()
+
+    def path(self, forum_id):
+        return os.path.join(self.root, f"{forum_id}.pdf")
+
+    def _load_manifest(self):
+        manifest = {}
+        # manifest.json is the format before the log
+        legacy_path = os.path.join(self.root, "manifest.json")
+        try:
+            with open(legacy_path) as fp:
+                manifest.update(json.load(fp))
+        except (OSError, ValueError):
+            pass
+        try:
+            with open(self.manifest_path) as fp:
+                for line in fp:
+                    try:
+                        forum_id, entry = json.loads(line)
+                    except ValueError:
+                        continue  # a line cut short by a crash
+                    manifest[forum_id] = entry
+        except OSError:
+            pass
+        return manifest
+
+    def _save_manifest(self):
+        """
+        Compact the log to the latest entry of each forum.
+        """
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w") as fp:
+            for forum_id, entry in self.manifest.items():
+                fp.write(json.dumps([forum_id, entry]) + "\n")
+        os.replace(tmp_path, self.manifest_path)
+        legacy_path = os.path.join(self.root, "manifest.json")
+        if os.path.exists(legacy_path):
+            os.remove(legacy_path)
+
+    def _update(self, forum_id, entry):
+        with self._lock:
+            self.manifest[forum_id] = entry
+            with open(self.manifest_path, "a") as fp:
+                fp.write(json.dumps([forum_id, entry]) + "\n")
+
+    def has(self, forum_id):
+        entry = self.manifest.get(forum_id)
+        if entry is None or entry.get("partial"):
+            return False
+        path = self.path(forum_id)
+        return os.path.exists(path) and os.path.getsize(path) == entry["size"]
+
+    def _adopt(self, forum_id, url, session, timeout):
+        """
+        Register a PDF downloaded before the manifest existed if its size
+        matches the server's Content-Length.
+        """
+        path = self.path(forum_id)
+        try:
+            response = session.head(url, timeout=timeout, allow_redirects=True)
+        except Exception:
+            return False
+        length = response.headers.get("Content-Length")
+        if response.status_code != 200 or length is None:
+            return False
+        if int(length) != os.path.getsize(path):
+            return False
+        digest = sha256_file(path, self.chunk_size)
+        self._update(
+            forum_id,
+            {
+                "url": url,
+                "size": int(length),
+                "etag": response.headers.get("ETag"),
+                "sha256": digest,
+            },
+        )
+        return True
+
+    def get(self, forum_id, url, session=None, timeout=None):
+        """
+        Returns the path of the forum's PDF, downloading it if needed.
+        Raises DownloadError if it could not be downloaded.
+        """
+        session = session or default_session()
+        path = self.path(forum_id)
+        if self.has(forum_id):
+            return path
+        if os.path.exists(path) and self._adopt(forum_id, url, session, timeout):
+            return path
+
+        part_path = f"{path}.part"
+        entry = self.manifest.get(forum_id) or {}
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {}
+        if offset and entry.get("partial") and entry.get("etag"):
+            headers["Range"] = f"bytes={offset}-"
+            headers["If-Range"] = entry["etag"]
+        try:
+            with session.get(
+                url, headers=headers, timeout=timeout, stream=True
+            ) as response:
+                if response.status_code == 206:
+                    mode = "ab"
+                elif response.status_code == 200:
+                    mode = "wb"
+                elif response.status_code == 416 and "Range" in headers:
+                    mode = None
+                else:
+                    raise DownloadError(f"status {response.status_code}")
+                if mode is None:
+                    # nothing left past the end of the .part: it is complete,
+                    # unless the server reports a different total size
+                    total = response.headers.get("Content-Range", "").rpartition("/")[2]
+                    if total.isdigit() and int(total) != offset:
+                        raise DownloadError(
+                            f"cannot resume, .part has {offset} of {total} bytes"
+                        )
+                    etag = entry["etag"]
+                else:
+                    etag = response.headers.get("ETag")
+                    self._update(forum_id, {"url": url, "etag": etag, "partial": True})
+                    with open(part_path, mode) as fp:
+                        for chunk in response.iter_content(chunk_size=self.chunk_size):
+                            fp.write(chunk)
+        except DownloadError:
+            raise
+        except Exception as e:
+            raise DownloadError(f"{type(e).__name__}: {e}") from e
+
+        digest = sha256_file(part_path, self.chunk_size)
+        os.replace(part_path, path)
+        self._update(
+            forum_id,
+            {
+                "url": url,
+                "size": os.path.getsize(path),
+                "etag": etag,
+                "sha256": digest,
+            },
+        )
+        return path
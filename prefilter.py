@@ -0,0 +1,159 @@
+import math
+
+from filters import normalize_paper_keywords, normalize_text
+
+
+def max_indel_distance(len1, len2, threshold):
+    """
+    Largest indel distance between strings of these lengths whose fuzz ratio
+    still rounds to at least `threshold`.
+    """
+    # ratio = 100 * (1 - distance / (len1 + len2)) and thefuzz rounds the
+    # result, so anything scoring >= threshold - 0.5 has to be kept
+    return math.floor((len1 + len2) * (100.5 - threshold) / 100 + 1e-9)
+
+
+def split_pieces(keyword, n_pieces):
+    """
+    Split a keyword into `n_pieces` contiguous pieces of near equal length.
+    """
+    size, extra = divmod(len(keyword), n_pieces)
+    pieces = []
+    start = 0
+    for idx in range(n_pieces):
+        end = start + size + (1 if idx < extra else 0)
+        pieces.append(keyword[start:end])
+        start = end
+    return pieces
+
+
+class KeywordPrefilter:
+    """
+    Exact substring pass that rejects papers before any fuzzy scoring.
+
+    Uses the pigeonhole bound: if a keyword of length L scores at least the
+    threshold against some substring, at most `d = max_indel_distance(L, L)`
+    characters were inserted or deleted. So splitting the keyword into d + 1
+    pieces leaves at least one piece verbatim in the text. The check is a
+    handful of `in` tests per keyword, and a rejected paper could never have
+    matched the compiled KeywordMatcher. Custom filters are never used to
+    reject a paper.
+
+    Args:
+      matcher: KeywordMatcher to prefilter for
+      min_piece_len: Do not reject on keywords whose pieces would be shorter
+        than this, since very short pieces occur in almost any text
+    """
+
+    def __init__(self, matcher, min_piece_len=2):
+        self.matcher = matcher
+        self.min_piece_len = min_piece_len
+        normalize = lambda kw: matcher.normalized[matcher._key(kw)]
+        if matcher.filter_mode == "MIX":
+            self.keywords = None
+            self.groups = [[normalize(kw) for kw in group] for group in matcher.groups]
+        else:
+            self.keywords = [normalize(kw) for kw in matcher.keywords]
+            self.groups = None
+        self._pieces = {}
+        self._text_pieces = {}
+        self.checked = 0
+        self.rejected = 0
+
+    def __call__(self, paper):
+        return self.may_match(paper)
+
+    def pieces(self, keyword, distance):
+        """
+        Pieces of which at least one must occur verbatim, None if any text can match.
+        """
+        key = (keyword, distance)
+        if key not in self._pieces:
+            n_pieces = distance + 1
+            if n_pieces * self.min_piece_len > len(keyword):
+                self._pieces[key] = None
+            else:
+                self._pieces[key] = split_pieces(keyword, n_pieces)
+        return self._pieces[key]
+
+    def _text_may_match(self, keyword, text, threshold):
+        if len(text) < len(keyword):
+            # partial_ratio aligns the shorter string, so the bound flips
+            return True
+        key = (keyword, threshold)
+        if key not in self._text_pieces:
+            self._text_pieces[key] = self.pieces(
+                keyword, max_indel_distance(len(keyword), len(keyword), threshold)
+            )
+        pieces = self._text_pieces[key]
+        if pieces is None:
+            return True
+        for piece in pieces:
+            if piece in text:
+                return True
+        return False
+
+    def _keywords_may_match(self, keyword, paper_keywords, threshold):
+        for paper_keyword in paper_keywords:
+            length_bound = 200 * min(len(keyword), len(paper_keyword))
+            if length_bound / (len(keyword) + len(paper_keyword)) < threshold - 0.5:
+                continue
+            distance = max_indel_distance(len(keyword), len(paper_keyword), threshold)
+            pieces = self.pieces(keyword, distance)
+            if pieces is None or any(piece in paper_keyword for piece in pieces):
+                return True
+        return False
+
+    def _may_match(self, paper, idx, keywords, fields):
+        spec = self.matcher.specs[idx]
+        if spec is None:
+            return True
+        field, _, threshold = spec
+        if field not in fields:
+            value = paper.content.get(field)
+            if field == "keywords":
+                fields[field] = normalize_paper_keywords(value)
+            else:
+                fields[field] = normalize_text(value)
+        value = fields[field]
+        if not value:
+            return False
+        for kw in keywords:
+            if kw is None:
+                continue
+            if field == "keywords":
+                if self._keywords_may_match(kw, value, threshold):
+                    return True
+            elif self._text_may_match(kw, value, threshold):
+                return True
+        return False
+
+    def may_match(self, paper):
+        """
+        False only if the paper cannot satisfy the matcher's filters.
+        """
+        self.checked += 1
+        fields = {}
+        n_filters = len(self.matcher.filters)
+        if self.matcher.filter_mode == "AND":
+            may_match = all(
+                self._may_match(paper, idx, self.keywords, fields)
+                for idx in range(n_filters)
+            )
+        elif self.matcher.filter_mode == "MIX":
+            may_match = all(
+                any(
+                    self._may_match(paper, idx, [kw], fields)
+                    for kw in group
+                    for idx in range(n_filters)
+                )
+                for group in self.groups
+            )
+        else:
+            may_match = any(
+                self._may_match(paper, idx, self.keywords, fields)
+                for idx in range(n_filters)
+            )
+        if not may_match:
+            self.rejected += 1
+        return may_match
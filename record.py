@@ -0,0 +1,164 @@
+import sys
+
+# Note attributes every record keeps; anything else is dropped unless asked for
+RECORD_ATTRIBUTES = ("id", "forum", "number", "cdate", "tcdate", "tmdate", "pdate")
+# short strings repeat across papers (keywords, venue names, author IDs),
+# so one copy of each is shared
+INTERN_MAX_LEN = 64
+
+
+def unwrap(value):
+    """
+    Plain value of a note content field: API v2 {"value": ...} wrappers are
+    removed recursively, strings in lists and short strings are interned.
+    Only dicts whose sole key is "value" are wrappers, as in the Extractor.
+    """
+    while isinstance(value, dict) and value.keys() == {"value"}:
+        value = value["value"]
+    if isinstance(value, str):
+        return sys.intern(value) if len(value) <= INTERN_MAX_LEN else value
+    if isinstance(value, list):
+        return [unwrap(item) for item in value]
+    return value
+
+
+class PaperRecord:
+    """
+    Compact stand-in for an OpenReview note, built right after fetching.
+
+    Holds the note's IDs and dates, its content with every value unwrapped,
+    its `details` if they were requested, and its invitations. Filters,
+    extractors and fns read it like a note (`paper.forum`,
+    `paper.content["title"]`); the content values are already plain, so
+    `unwrap_value` on them is a no-op.
+
+    Other note attributes are only available if listed in `attributes` when
+    the record is built, or if the raw note is kept.
+    """
+
+    __slots__ = (
+        "id",
+        "forum",
+        "number",
+        "cdate",
+        "tcdate",
+        "tmdate",
+        "pdate",
+        "invitations",
+        "api_version",
+        "content",
+        "details",
+        "extra",
+        "raw",
+    )
+
+    def __init__(
+        self,
+        id,
+        forum,
+        content,
+        number=None,
+        cdate=None,
+        tcdate=None,
+        tmdate=None,
+        pdate=None,
+        invitations=(),
+        api_version=None,
+        details=None,
+        extra=None,
+        raw=None,
+    ):
+        self.id = id
+        self.forum = forum
+        self.number = number
+        self.cdate = cdate
+        self.tcdate = tcdate
+        self.tmdate = tmdate
+        self.pdate = pdate
+        self.invitations = invitations
+        self.api_version = api_version
+        self.content = content
+        self.details = details
+        self.extra = extra
+        self.raw = raw
+
+    @classmethod
+    def from_note(cls, note, api_version=None, keep_raw=False, attributes=()):
+        """
+        Args:
+          note: openreview.Note or openreview.api.Note
+          api_version: 1 or 2, recorded on the record
+          keep_raw: Keep the note itself, so every attribute stays readable
+          attributes: Other note attributes to keep, e.g. the fields of an
+            Extractor
+        """
+        invitations = getattr(note, "invitations", None) or [
+            getattr(note, "invitation", None)
+        ]
+        extra = {
+            attribute: getattr(note, attribute, None)
+            for attribute in attributes
+            if attribute not in RECORD_ATTRIBUTES and attribute not in cls.__slots__
+        }
+        return cls(
+            sys.intern(note.id) if note.id else note.id,
+            sys.intern(note.forum) if note.forum else note.forum,
+            {field: unwrap(value) for field, value in (note.content or {}).items()},
+            number=getattr(note, "number", None),
+            cdate=getattr(note, "cdate", None),
+            tcdate=getattr(note, "tcdate", None),
+            tmdate=getattr(note, "tmdate", None),
+            pdate=getattr(note, "pdate", None),
+            invitations=tuple(
+                sys.intern(invitation) for invitation in invitations if invitation
+            ),
+            api_version=api_version,
+            details=getattr(note, "details", None) or None,
+            extra=extra or None,
+            raw=note if keep_raw else None,
+        )
+
+    def __getattr__(self, name):
+        # only called for attributes not in the slots
+        if name.startswith("__") or name in ("extra", "raw"):
+            raise AttributeError(name)
+        if self.extra and name in self.extra:
+            return self.extra[name]
+        if self.raw is not None:
+            return getattr(self.raw, name)
+        raise AttributeError(
+            f"{type(self).__name__} has no attribute {name!r}; keep it with "
+            "attributes=[...] or keep_raw=True"
+        )
+
+    def __repr__(self):
+        return f"{type(self).__name__}(forum={self.forum!r}, api_version={self.api_version!r})"
+
+    @property
+    def invitation(self):
+        return self.invitations[0] if self.invitations else None
+
+    def copy(self):
+        return PaperRecord(
+            self.id,
+            self.forum,
+            dict(self.content),
+            number=self.number,
+            cdate=self.cdate,
+            tcdate=self.tcdate,
+            tmdate=self.tmdate,
+            pdate=self.pdate,
+            invitations=self.invitations,
+            api_version=self.api_version,
+            details=self.details,
+            extra=self.extra,
+            raw=self.raw,
+        )
+
+
+def to_records(notes, api_version=None, keep_raw=False, attributes=()):
+    """
+    Yield a PaperRecord for each note, so the notes can be freed as they go.
+    """
+    for note in notes:
+        yield PaperRecord.from_note(note, api_version, keep_raw, attributes)
@@ -1,7 +1,22 @@
-from utils import get_client, to_csv, papers_to_list
-from venue import get_venues, group_venues
-from paper import get_papers
-from filters import satisfies_any_filters, satisfies_all_filters, satisfies_mixed_filters
+import json
+import multiprocessing
+import time
+
+from utils import get_client, to_csv, stream_to_csv, papers_to_list, load_papers, Row
+from venue import get_venues, filter_venues, group_venues, VenueDirectory
+from paper import get_papers, iter_papers
+from filters import KeywordMatcher
+from prefilter import KeywordPrefilter
+from parallel import filter_papers_parallel
+from forum_index import ForumIndex
+from fetch_profile import FetchProfile, flatten_keywords
+from transport import Transport
+from checkpoint import Checkpoint, run_fingerprint
+from metrics import Metrics, PrintReporter, NULL_METRICS, PRINT_REPORTER
+from transforms import TransformRunner
+from enrich import Enricher
+from bibtex import CitationKeys, read_keys, write_bibtex
+from search import PaperIndex
 
 
 class Scraper:
@@ -17,21 +32,142 @@ class Scraper:
         groups=["conference"],
         only_accepted=True,
         filter_mode="OR",
+        max_workers=1,
+        max_per_host=None,
+        cache=None,
+        prefilter=False,
+        n_jobs=1,
+        chunk_size=500,
+        stream=False,
+        enricher=None,
+        snapshot=None,
+        dedupe=False,
+        fetch_profile=None,
+        server_search=False,
+        fetch_replies=None,
+        venue_cache=".cache/venues.json",
+        venue_ttl=24 * 60 * 60,
+        transport=None,
+        resume=False,
+        checkpoint_dir=None,
+        metrics=None,
+        reporter=None,
+        metrics_path=None,
+        transform_workers=8,
+        transform_errors="raise",
+        keep_raw=False,
+        bib_path=None,
+        index_path=None,
     ):
         # fns is a list of functions that can be specified by the user each taking in a single paper object as a parameter and returning the modified paper
+        # fns declared with transforms.transform run concurrently on up to
+        # transform_workers papers at a time, overlapping with filtering.
+        # A fn that raises stops the run (transform_errors="raise") or is
+        # skipped for that paper and reported (transform_errors="report")
         self.confs = conferences
         self.years = years
         self.keywords = keywords
         self.extractor = extractor
         self.fpath = fpath
         self.fns = fns
+        self.transform_workers = transform_workers
+        self.transform_errors = transform_errors
         self.groups = groups
         self.only_accepted = only_accepted
         self.selector = selector
         self.filters = []
+        self.matcher = None  # compiled from keywords and filters in filter_papers
+        # prefilter=True rejects papers with a cheap exact substring pass
+        # before fuzzy scoring; it never drops a paper the matcher would keep
+        self.prefilter = prefilter
+        # n_jobs > 1 runs the filter stage in a process pool, chunk_size papers at a time
+        self.n_jobs = n_jobs
+        self.chunk_size = chunk_size
         self.filter_mode = filter_mode.upper()  # 'OR' (default) or 'AND'
+        # max_workers > 1 fetches all venues and API versions concurrently
+        self.max_workers = max_workers
+        self.max_per_host = max_per_host
+        # optional NoteCache so unchanged venues are not downloaded again
+        self.cache = cache
+        # stream=True fetches, filters, transforms and writes one paper at a time
+        self.stream = stream
+        # optional Enricher that fetches PDFs and BibTeX for matched papers
+        # concurrently, before fns run
+        self.enricher = enricher
+        # snapshot is the path of papers saved with save_papers; when given the
+        # scraper works offline, re-filtering the snapshot without any client
+        self.snapshot = snapshot
+        self.snapshot_papers = None
+        # dedupe=True keeps an index of exported forums next to fpath and skips
+        # them on later runs, before scoring, enrichment and writing
+        self.dedupe = dedupe
+        self.forum_index = None
+        # forums of the rows handed to the CSV, the ones recorded as exported
+        self.written_forums = []
+        # fetch_profile decides what note queries request; by default it is built
+        # per run so directReplies are only pulled when the extractor needs
+        # details (fetch_replies=True forces them, e.g. for fns reading details).
+        # server_search=True narrows venues with the search endpoint, whose papers
+        # come without details (so not with fetch_replies=True).
+        # Fetched notes are kept as compact PaperRecords with unwrapped content;
+        # keep_raw=True also keeps each full note, e.g. for fns reading signatures
+        self.fetch_profile = fetch_profile
+        self.server_search = server_search
+        self.fetch_replies = fetch_replies
+        self.keep_raw = keep_raw
+        # the venue list is cached at venue_cache for venue_ttl seconds, so warm
+        # runs make no request to find venues; venue_cache=None always fetches it
+        self.venue_directory = (
+            VenueDirectory(venue_cache, venue_ttl) if venue_cache is not None else None
+        )
+        # metrics collects stage and venue timers, note/byte/retry/match counters
+        # and per-paper filter times; with metrics_path they are written to
+        # <metrics_path>.json and <metrics_path>.prom after every run. reporter
+        # receives progress messages, printed by default
+        self.metrics = metrics or Metrics()
+        self.reporter = reporter or PrintReporter()
+        self.metrics_path = metrics_path
+        # every request goes through transport: rate limited per host, retried
+        # with backoff, and recorded in transport.failures when it still fails
+        self.transport = transport or Transport()
+        for transport_ in (self.transport, getattr(enricher, "transport", None)):
+            if transport_ is not None and transport_.metrics is NULL_METRICS:
+                transport_.metrics = self.metrics
+        if enricher is not None:
+            # failed downloads are counted and reported with the run's own
+            if enricher.metrics is NULL_METRICS:
+                enricher.metrics = self.metrics
+            if enricher.reporter is PRINT_REPORTER:
+                enricher.reporter = self.reporter
+        # with a checkpoint_dir (default <fpath>.checkpoint when resume=True) fetched
+        # pages, filtered venues, enrichment and streamed rows are saved as they
+        # complete; resume=True continues an interrupted run from there. The
+        # checkpoint is removed once a run completes
+        self.resume = resume
+        self.checkpoint_dir = checkpoint_dir or (
+            f"{fpath}.checkpoint" if resume else None
+        )
+        self.checkpoint = None
+        # bib_path writes a .bib of the matched papers: entries are built from
+        # their metadata, forum pages are only fetched (through an Enricher made
+        # for it if none is given) when that is not enough, and citation keys are
+        # unique across the file. content['bibtex'] gets the same entry
+        self.bib_path = bib_path
+        if bib_path is not None and self.enricher is None:
+            self.enricher = Enricher(
+                pdfs=False,
+                transport=self.transport,
+                metrics=self.metrics,
+                reporter=self.reporter,
+            )
+            self.enricher.bibtex_builder.fetch = snapshot is None
+        self.bib_keys = None
+        self.bib_entries = None
+        # index_path keeps a full-text index of every fetched paper, updated on
+        # each run, which `search` ranks with BM25 without fetching or scanning
+        self.index = PaperIndex(index_path) if index_path is not None else None
         # Get both API v1 and API v2 clients
-        self.clients = get_client()
+        self.clients = get_client(self.transport) if snapshot is None else None
         self.papers = (
             None  # this'll contain all the papers returned from apply_on_papers
         )
@@ -39,63 +175,568 @@ class Scraper:
     def __call__(self):
         self.scrape()
 
-    def scrape(self):
-        print("Getting venues...")
-        venues = get_venues(self.clients, self.confs, self.years)
-        print("Getting papers...\n")
-        papers = get_papers(
-            self.clients, group_venues(venues, self.groups), self.only_accepted
+    def open_checkpoint(self):
+        if self.checkpoint_dir is None:
+            return
+        self.checkpoint = Checkpoint(
+            self.checkpoint_dir, cache=self.cache, reporter=self.reporter
+        ).open(run_fingerprint(self), resume=self.resume)
+
+    def open_bibtex(self):
+        if self.bib_path is None:
+            return
+        # with dedupe the .bib grows with the CSV, so keys already in it are taken
+        self.bib_keys = CitationKeys(read_keys(self.bib_path) if self.dedupe else ())
+        self.bib_entries = []
+
+    def add_bibtex(self, paper, venue):
+        bibtex = paper.content.get("bibtex")
+        if bibtex is None:
+            bibtex = self.enricher.bibtex_builder.get(paper, venue)
+        if bibtex:
+            bibtex = self.bib_keys.rekey(bibtex)
+        # the entry goes to the .bib only if the row is written (see iter_written)
+        paper.content["bibtex"] = bibtex
+
+    def save_bibtex(self):
+        if self.bib_entries is None:
+            return
+        n_entries = write_bibtex(
+            self.bib_entries, self.bib_path, append=self.dedupe, rekey=False
         )
+        self.reporter.info(f"Saved {n_entries} BibTeX entries at {self.bib_path}")
+        self.bib_entries = None
+
+    def close_checkpoint(self):
+        if self.checkpoint is None:
+            return
+        if getattr(self.selector, "stopped_early", False):
+            # the run is not finished: keep fetched pages for the next session
+            self.reporter.info(
+                f"Review stopped early, keeping the checkpoint at {self.checkpoint_dir}"
+            )
+        else:
+            self.checkpoint.clear()
+        self.checkpoint = None
+
+    @property
+    def note_source(self):
+        # the checkpoint stands in for the cache, fetching through it if given
+        return self.checkpoint if self.checkpoint is not None else self.cache
+
+    def scrape(self):
+        if self.stream and self.snapshot is None:
+            return self.scrape_stream()
+        self.open_checkpoint()
+        self.open_bibtex()
+        if self.snapshot is not None:
+            with self.metrics.timer("stage_seconds", stage="load_snapshot"):
+                papers = self.load_snapshot()
+        else:
+            self.reporter.stage("Getting venues")
+            with self.metrics.timer("stage_seconds", stage="venues"):
+                venues = get_venues(
+                    self.clients,
+                    self.confs,
+                    self.years,
+                    self.venue_directory,
+                    failures=self.transport.failures,
+                )
+            self.reporter.stage("Getting papers")
+            with self.metrics.timer("stage_seconds", stage="fetch"):
+                papers = get_papers(
+                    self.clients,
+                    group_venues(venues, self.groups),
+                    self.only_accepted,
+                    max_workers=self.max_workers,
+                    max_per_host=self.max_per_host,
+                    cache=self.note_source,
+                    profile=self.get_fetch_profile(),
+                    failures=self.transport.failures,
+                    metrics=self.metrics,
+                    reporter=self.reporter,
+                )
         self.papers = papers
-        print("\nFiltering papers...")
+        if self.index is not None:
+            with self.metrics.timer("stage_seconds", stage="index"):
+                self.index.add_papers(papers)
+        if self.dedupe:
+            self.forum_index = ForumIndex(self.fpath)
+            papers = self.drop_exported(papers)
+        self.reporter.stage("Filtering papers")
         papers = self.apply_on_papers(papers)
-        if self.selector is not None:
-            papers_list = self.selector(papers)
+        with self.metrics.timer("stage_seconds", stage="select"):
+            if self.selector is not None:
+                papers_list = self.selector(papers)
+            else:
+                papers_list = papers_to_list(papers)
+        self.reporter.stage("Saving as CSV")
+        self.written_forums = []
+        with self.metrics.timer("stage_seconds", stage="write"):
+            to_csv(self.iter_written(papers_list), self.fpath)
+        self.metrics.inc("rows_written", len(papers_list))
+        self.reporter.info(f"Saved at {self.fpath}")
+        if self.forum_index is not None:
+            self.forum_index.add(self.written_forums)
+        self.save_bibtex()
+        self.close_checkpoint()
+        self.report_failures()
+        self.export_metrics()
+
+    def iter_written(self, rows):
+        """
+        Pass rows on to the CSV, recording the forums and BibTeX entries of
+        those written; papers a selector dropped are never marked as exported
+        nor added to the .bib.
+        """
+        for row in rows:
+            forum = getattr(row, "forum", None)
+            if forum is not None:
+                self.written_forums.append(forum)
+            bibtex = getattr(row, "bibtex", None)
+            if self.bib_entries is not None and bibtex:
+                self.bib_entries.append(bibtex)
+            yield row
+
+    def export_metrics(self):
+        if self.cache is not None:
+            for name in ("hits", "misses", "refreshes"):
+                self.metrics.set(f"cache_{name}", getattr(self.cache, name, 0))
+        if self.metrics_path is not None:
+            self.metrics.save_json(f"{self.metrics_path}.json")
+            self.metrics.save_prometheus(f"{self.metrics_path}.prom")
+
+    def report_failures(self):
+        """
+        Print a summary of what could not be fetched and save the details to
+        `<fpath>.failures.json`.
+        """
+        failures = list(self.transport.failures)
+        if (
+            self.enricher is not None
+            and self.enricher.failures is not self.transport.failures
+        ):
+            failures += list(self.enricher.failures)
+        if not failures:
+            return
+        counts = {}
+        for failure in failures:
+            counts[failure["kind"]] = counts.get(failure["kind"], 0) + 1
+        fpath = f"{self.fpath}.failures.json"
+        with open(fpath, "w") as fp:
+            json.dump(failures, fp, indent=2)
+        self.reporter.error(f"Failed to fetch {counts}, details at {fpath}")
+
+    def drop_exported(self, papers):
+        """
+        Remove the papers whose forum was exported to fpath by an earlier run.
+        """
+        new_papers = {}
+        n_skipped = 0
+        for group, grouped_venues in papers.items():
+            new_papers[group] = {}
+            for venue, venue_papers in grouped_venues.items():
+                new_papers[group][venue] = [
+                    paper
+                    for paper in venue_papers
+                    if paper.forum not in self.forum_index
+                ]
+                n_skipped += len(venue_papers) - len(new_papers[group][venue])
+        self.metrics.inc("papers_skipped_exported", n_skipped)
+        self.reporter.info(
+            f"Skipping {n_skipped} papers already exported to {self.fpath}"
+        )
+        return new_papers
+
+    def get_fetch_profile(self):
+        if self.fetch_profile is not None:
+            return self.fetch_profile
+        return FetchProfile.from_scraper(
+            self.extractor,
+            self.keywords,
+            replies=self.fetch_replies,
+            server_search=self.server_search,
+            keep_raw=self.keep_raw,
+        )
+
+    def load_snapshot(self):
+        """
+        Papers of the snapshot for the scraper's conferences, years and groups.
+        The snapshot is read once and reused by later calls.
+        """
+        if self.snapshot_papers is None:
+            self.snapshot_papers = {}
+            for grouped_venues in load_papers(self.snapshot).values():
+                self.snapshot_papers.update(grouped_venues)
+        venues = filter_venues(list(self.snapshot_papers), self.confs, self.years)
+        return {
+            group: {venue: self.snapshot_papers[venue] for venue in grouped_venue}
+            for group, grouped_venue in group_venues(venues, self.groups).items()
+        }
+
+    def filter_papers(self, papers):
+        """
+        Returns a dict by group and venue of (paper, matched keyword(s), filter type(s))
+        for the papers that satisfy the filters.
+        """
+        if self.checkpoint is None:
+            return self.match_papers(papers)
+        matched_papers = {}
+        todo = {}
+        for group, grouped_venues in papers.items():
+            matched_papers[group] = {}
+            for venue, venue_papers in grouped_venues.items():
+                matches = self.checkpoint.load_matches(venue, venue_papers)
+                if matches is None:
+                    todo.setdefault(group, {})[venue] = venue_papers
+                matched_papers[group][venue] = matches
+        for group, grouped_venues in self.match_papers(todo).items():
+            for venue, matches in grouped_venues.items():
+                self.checkpoint.save_matches(venue, matches)
+                matched_papers[group][venue] = matches
+        return matched_papers
+
+    def match_paper(self, paper, prefilter=None):
+        """
+        Match one paper, recording its filter time and matched filter types.
+        """
+        start = time.perf_counter()
+        self.metrics.inc("papers_filtered")
+        if prefilter is not None and not prefilter.may_match(paper):
+            self.metrics.inc("papers_prefiltered")
+            result = None, None, False
         else:
-            papers_list = papers_to_list(papers)
-        print("Saving as CSV...")
-        to_csv(papers_list, self.fpath)
-        print(f"Saved at {self.fpath}")
+            result = self.matcher.match(paper)
+        self.metrics.observe("filter_seconds_per_paper", time.perf_counter() - start)
+        if result[2]:
+            self.count_match(result[1])
+        return result
 
-    def apply_on_papers(self, papers):
-        modified_papers = {}
+    def count_match(self, filter_type):
+        filter_types = filter_type if isinstance(filter_type, list) else [filter_type]
+        for filter_type in filter_types:
+            self.metrics.inc("papers_matched", filter=filter_type)
+
+    def prepare_filters(self, papers):
+        """
+        Show every paper to the filters that score papers in batches
+        (e.g. semantic.SemanticFilter) before they are called one by one.
+        """
+        papers_list = None
+        for filter_, _, _ in self.filters:
+            if hasattr(filter_, "prepare"):
+                if papers_list is None:
+                    papers_list = papers_to_list(papers)
+                filter_.prepare(papers_list, flatten_keywords(self.keywords))
+
+    def match_papers(self, papers):
+        self.matcher = KeywordMatcher(self.keywords, self.filters, self.filter_mode)
+        if self.n_jobs > 1:
+            if any(hasattr(filter_, "prepare") for filter_, _, _ in self.filters):
+                if multiprocessing.get_start_method() != "fork":
+                    raise ValueError(
+                        "Filters with a prepare step (e.g. SemanticFilter) need the "
+                        "fork start method with n_jobs > 1; use n_jobs=1"
+                    )
+                # prepared here, the forked workers inherit the fitted filters
+                self.prepare_filters(papers)
+            matched_papers = filter_papers_parallel(
+                papers,
+                self.keywords,
+                self.filters,
+                self.filter_mode,
+                self.n_jobs,
+                chunk_size=self.chunk_size,
+                prefilter=self.prefilter,
+            )
+            self.metrics.inc("papers_filtered", len(papers_to_list(papers)))
+            for grouped_venues in matched_papers.values():
+                for venue_matches in grouped_venues.values():
+                    for _, _, satisfying_filter_type in venue_matches:
+                        self.count_match(satisfying_filter_type)
+            return matched_papers
+        prefilter = KeywordPrefilter(self.matcher) if self.prefilter else None
+        self.prepare_filters(papers)
+        matched_papers = {}
         for group, grouped_venues in papers.items():
-            modified_papers[group] = {}
+            matched_papers[group] = {}
             for venue, venue_papers in grouped_venues.items():
-                modified_papers[group][venue] = []
-                venue_split = venue.split("/")
-                venue_name, venue_year, venue_type = (
-                    venue_split[0],
-                    venue_split[1],
-                    venue_split[2],
-                )
+                matched_papers[group][venue] = []
                 for paper in venue_papers:
-                    # FILTERS
-                    if self.filter_mode == "AND":
-                        satisfying_keyword, satisfying_filter_type, satisfies = (
-                            satisfies_all_filters(paper, self.keywords, self.filters)
-                        )
-                    elif self.filter_mode == "MIX":
-                        satisfying_keyword, satisfying_filter_type, satisfies = (
-                            satisfies_mixed_filters(paper, self.keywords, self.filters)
-                        )
-                    else:
-                        satisfying_keyword, satisfying_filter_type, satisfies = (
-                            satisfies_any_filters(paper, self.keywords, self.filters)
-                        )
+                    satisfying_keyword, satisfying_filter_type, satisfies = (
+                        self.match_paper(paper, prefilter)
+                    )
                     if satisfies:
-                        paper.content["match"] = {
-                            str(satisfying_filter_type): satisfying_keyword
-                        }
-                        paper.content["group"] = group
-                        for fn in self.fns:
-                            paper = fn(paper)
-                        extracted_paper = self.extractor(paper)
-                        extracted_paper["venue"] = venue_name
-                        extracted_paper["year"] = venue_year
-                        extracted_paper["type"] = venue_type
-                        modified_papers[group][venue].append(extracted_paper)
+                        matched_papers[group][venue].append(
+                            (paper, satisfying_keyword, satisfying_filter_type)
+                        )
+        return matched_papers
+
+    def apply_on_papers(self, papers):
+        if self.enricher is None and self.checkpoint is None and self.n_jobs == 1:
+            # filter lazily, so fns run on matched papers while later papers
+            # are still being scored
+            self.matcher = KeywordMatcher(self.keywords, self.filters, self.filter_mode)
+            prefilter = KeywordPrefilter(self.matcher) if self.prefilter else None
+            self.prepare_filters(papers)
+            matches = self.iter_matches(
+                (
+                    (group, venue, paper)
+                    for group, grouped_venues in papers.items()
+                    for venue, venue_papers in grouped_venues.items()
+                    for paper in venue_papers
+                ),
+                prefilter,
+            )
+            with self.metrics.timer("stage_seconds", stage="filter_transform"):
+                return self.transform_matches(matches, papers)
+
+        with self.metrics.timer("stage_seconds", stage="filter"):
+            matched_papers = self.filter_papers(papers)
+        if self.enricher is not None:
+            to_enrich = [
+                paper
+                for grouped_venues in matched_papers.values()
+                for venue_matches in grouped_venues.values()
+                for paper, _, _ in venue_matches
+            ]
+            with self.metrics.timer("stage_seconds", stage="enrich"):
+                if self.checkpoint is not None:
+                    self.checkpoint.enrich(self.enricher, to_enrich)
+                else:
+                    self.enricher.enrich(to_enrich)
+        matches = (
+            (group, venue, paper, satisfying_keyword, satisfying_filter_type)
+            for group, grouped_venues in matched_papers.items()
+            for venue, venue_matches in grouped_venues.items()
+            for paper, satisfying_keyword, satisfying_filter_type in venue_matches
+        )
+        with self.metrics.timer("stage_seconds", stage="transform"):
+            return self.transform_matches(matches, matched_papers)
+
+    def transform_matches(self, matches, layout):
+        """
+        Run fns and the extractor on (group, venue, paper, keyword, filter type)
+        matches, returning the extracted papers by group and venue in the
+        order of `layout`.
+        """
+        modified_papers = {
+            group: {venue: [] for venue in grouped_venues}
+            for group, grouped_venues in layout.items()
+        }
+        for (group, venue, forum), paper in self.iter_transformed(matches):
+            modified_papers[group][venue].append(
+                self.extract_paper(paper, venue, forum)
+            )
         return modified_papers
 
+    def make_transform_runner(self):
+        return TransformRunner(
+            self.fns,
+            max_workers=self.transform_workers,
+            metrics=self.metrics,
+            reporter=self.reporter,
+            errors=self.transform_errors,
+        )
+
+    def iter_transformed(self, matches):
+        """
+        Yield ((group, venue, forum before fns), paper after fns) for each
+        match, in order, with declared transforms running concurrently (see
+        transforms.TransformRunner).
+        """
+
+        def prepared():
+            for (
+                group,
+                venue,
+                paper,
+                satisfying_keyword,
+                satisfying_filter_type,
+            ) in matches:
+                if self.snapshot is not None:
+                    # keep the loaded snapshot untouched by fns between runs
+                    paper = paper.copy()
+                self.prepare_paper(
+                    paper, group, satisfying_keyword, satisfying_filter_type
+                )
+                if self.bib_entries is not None:
+                    self.add_bibtex(paper, venue)
+                yield (group, venue, paper.forum), paper
+
+        with self.make_transform_runner() as runner:
+            for (key, _), paper in runner.imap(
+                prepared(), paper_of=lambda item: item[1]
+            ):
+                yield key, paper
+
+    def prepare_paper(self, paper, group, satisfying_keyword, satisfying_filter_type):
+        paper.content["match"] = {str(satisfying_filter_type): satisfying_keyword}
+        paper.content["group"] = group
+
+    def extract_paper(self, paper, venue, forum=None):
+        """
+        Row of the extracted paper; forum is its ID before fns, if they ran.
+        """
+        venue_split = venue.split("/")
+        venue_name, venue_year, venue_type = (
+            venue_split[0],
+            venue_split[1],
+            venue_split[2],
+        )
+        start = time.perf_counter()
+        extracted_paper = Row(
+            self.extractor(paper),
+            paper.forum if forum is None else forum,
+            paper.content.get("bibtex"),
+        )
+        self.metrics.observe("extract_seconds_per_paper", time.perf_counter() - start)
+        extracted_paper["venue"] = venue_name
+        extracted_paper["year"] = venue_year
+        extracted_paper["type"] = venue_type
+        return extracted_paper
+
+    def iter_papers(self):
+        """
+        Generator chain of fetch -> filter -> enrich -> fns -> extractor, yielding
+        extracted papers as soon as their note has been fetched.
+        """
+        self.reporter.stage("Getting venues")
+        with self.metrics.timer("stage_seconds", stage="venues"):
+            venues = get_venues(
+                self.clients,
+                self.confs,
+                self.years,
+                self.venue_directory,
+                failures=self.transport.failures,
+            )
+        self.matcher = KeywordMatcher(self.keywords, self.filters, self.filter_mode)
+        prefilter = KeywordPrefilter(self.matcher) if self.prefilter else None
+        self.reporter.stage("Getting papers")
+        papers = iter_papers(
+            self.clients,
+            group_venues(venues, self.groups),
+            self.only_accepted,
+            cache=self.note_source,
+            profile=self.get_fetch_profile(),
+            failures=self.transport.failures,
+            metrics=self.metrics,
+            reporter=self.reporter,
+        )
+        if self.index is not None:
+            papers = self.index.iter_add(papers)
+        matches = self.iter_matches(papers, prefilter)
+        if self.enricher is not None:
+            matches = self.enricher.imap(matches, paper_of=lambda match: match[2])
+        if self.checkpoint is not None:
+            matches = self.track_pending(matches)
+        for (_, venue, forum), paper in self.iter_transformed(matches):
+            yield self.extract_paper(paper, venue, forum)
+
+    def track_pending(self, matches):
+        for match in matches:
+            self.checkpoint.pending.append(match[2].forum)
+            yield match
+
+    def iter_matches(self, papers, prefilter=None):
+        for group, venue, paper in papers:
+            if self.forum_index is not None and paper.forum in self.forum_index:
+                continue
+            if self.checkpoint is not None and paper.forum in self.checkpoint.written:
+                continue
+            satisfying_keyword, satisfying_filter_type, satisfies = self.match_paper(
+                paper, prefilter
+            )
+            if satisfies:
+                yield group, venue, paper, satisfying_keyword, satisfying_filter_type
+
+    def scrape_stream(self):
+        self.open_checkpoint()
+        self.open_bibtex()
+        on_flush = None
+        if self.checkpoint is not None:
+            # rows flushed by an interrupted run are already in the CSV
+            self.written_forums = list(self.checkpoint.written)
+            on_flush = self.checkpoint.on_flush
+        else:
+            self.written_forums = []
+        if self.dedupe:
+            self.forum_index = ForumIndex(self.fpath)
+        papers = self.iter_papers()
+        flush_interval = 1.0
+        if self.selector is not None and hasattr(self.selector, "review"):
+            # papers are reviewed as they come out of the pipeline, which keeps
+            # fetching and filtering in a background thread; each selected paper
+            # is written at once, before its decision is saved. The review only
+            # ends once that thread has stopped, so nothing changes after it
+            papers = self.selector.review(papers)
+            flush_interval = 0
+            on_flush = None
+        elif self.selector is not None:
+            # other selectors need the whole list, so this gives up streaming
+            papers = self.selector({"": {"": list(papers)}})
+            on_flush = None
+        self.reporter.stage(f"Streaming to {self.fpath}")
+        with self.metrics.timer("stage_seconds", stage="stream"):
+            n_papers = stream_to_csv(
+                self.iter_written(papers),
+                self.fpath,
+                flush_interval=flush_interval,
+                on_flush=on_flush,
+            )
+        self.metrics.inc("rows_written", n_papers)
+        self.reporter.info(f"Saved {n_papers} papers at {self.fpath}")
+        if self.forum_index is not None:
+            self.forum_index.add(self.written_forums)
+        self.save_bibtex()
+        self.close_checkpoint()
+        self.report_failures()
+        self.export_metrics()
+
+    def search(
+        self, keywords=None, filter_mode=None, limit=100, rescore=False, query=None
+    ):
+        """
+        Rank the indexed papers of the scraper's conferences and years against
+        keywords with BM25, without fetching or scanning every paper.
+
+        Args:
+          keywords: Keywords, the scraper's by default
+          filter_mode: 'OR', 'AND' or 'MIX', the scraper's by default
+          limit: Number of top results
+          rescore: Also run the top results through the scraper's fuzzy
+            filters, keeping only those that match
+          query: Raw FTS5 query used instead of keywords
+
+        Returns:
+          List of extracted papers, best first, each with a 'score'
+        """
+        if self.index is None:
+            raise ValueError("search needs a Scraper with an index_path")
+        keywords = self.keywords if keywords is None else keywords
+        filter_mode = (filter_mode or self.filter_mode).upper()
+        venues = filter_venues(self.index.venues(), self.confs, self.years)
+        results = self.index.search(keywords, filter_mode, limit, venues, query=query)
+        matcher = (
+            KeywordMatcher(keywords, self.filters, filter_mode) if rescore else None
+        )
+        rows = []
+        for result in results:
+            if matcher is not None:
+                satisfying_keyword, satisfying_filter_type, satisfies = matcher.match(
+                    result.paper
+                )
+                if not satisfies:
+                    continue
+            else:
+                satisfying_keyword, satisfying_filter_type = query or keywords, "search"
+            self.prepare_paper(
+                result.paper, result.group, satisfying_keyword, satisfying_filter_type
+            )
+            row = self.extract_paper(result.paper, result.venue)
+            row["score"] = result.score
+            rows.append(row)
+        return rows
+
     def add_filter(self, filter_, *args, **kwargs):
         self.filters.append((filter_, args, kwargs))
@@ -0,0 +1,260 @@
+import json
+import os
+import sqlite3
+import threading
+
+from fetch_profile import flatten_keywords
+from record import PaperRecord, unwrap
+
+INDEXED_FIELDS = ("title", "abstract", "keywords")
+# content fields stored with each paper, so results can be extracted offline
+STORED_FIELDS = ("title", "abstract", "keywords", "authors", "pdf", "venueid")
+# BM25 weight of each indexed field, in INDEXED_FIELDS order
+FIELD_WEIGHTS = (3.0, 1.0, 2.0)
+
+
+def quote(term):
+    """
+    FTS5 phrase for a keyword: its words must appear next to each other.
+    """
+    return '"' + str(term).replace('"', '""') + '"'
+
+
+def match_expression(keywords, filter_mode="OR", fields=INDEXED_FIELDS):
+    """
+    FTS5 query with the semantics of the keyword filters: any keyword (OR),
+    every keyword (AND), or every group of `["a", ["b", "c"]]` (MIX, the
+    AND-of-ORs of `satisfies_mixed_filters`). Each keyword is a phrase.
+    """
+    filter_mode = filter_mode.upper()
+    if filter_mode == "MIX":
+        groups = [group if isinstance(group, list) else [group] for group in keywords]
+        clauses = []
+        for group in groups:
+            terms = flatten_keywords(group)
+            if terms:
+                clauses.append("(" + " OR ".join(quote(term) for term in terms) + ")")
+        expression = " AND ".join(clauses)
+    else:
+        joiner = " AND " if filter_mode == "AND" else " OR "
+        expression = joiner.join(quote(term) for term in flatten_keywords(keywords))
+    if not expression:
+        raise ValueError("No keywords to search for")
+    return "{" + " ".join(fields) + "}: (" + expression + ")"
+
+
+class SearchResult:
+    __slots__ = ("paper", "group", "venue", "score")
+
+    def __init__(self, paper, group, venue, score):
+        self.paper = paper
+        self.group = group
+        self.venue = venue
+        self.score = score
+
+    def __repr__(self):
+        return f"SearchResult(forum={self.paper.forum!r}, venue={self.venue!r}, score={self.score:.4g})"
+
+
+class PaperIndex:
+    """
+    Persistent full-text index of papers in an SQLite FTS5 table, so keyword
+    queries are index lookups instead of a fuzzy scan over every paper.
+
+    Title, abstract and keywords are indexed with Porter stemming and
+    diacritics removed; results are ranked by BM25 with the title and
+    keywords weighted over the abstract. A paper is re-indexed only when its
+    tmdate changes, so adding every fetched paper on each run is cheap.
+    Stored papers come back as PaperRecords, which filters, extractors and
+    fns read like notes. Each thread gets its own connection, so papers can
+    be indexed from the thread that fetches them.
+
+    Args:
+      path: SQLite file of the index
+      tokenizer: FTS5 tokenizer
+    """
+
+    def __init__(
+        self,
+        path=".cache/papers.sqlite",
+        tokenizer="porter unicode61 remove_diacritics 2",
+    ):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._local = threading.local()
+        self._conns = []
+        self._conns_lock = threading.Lock()
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS papers (id INTEGER PRIMARY KEY, "
+            "forum TEXT UNIQUE, grp TEXT, venue TEXT, tmdate INTEGER, content TEXT)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS papers_venue ON papers (venue)")
+        self.conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS papers_fts USING fts5("
+            + ", ".join(INDEXED_FIELDS)
+            + f", tokenize='{tokenizer}')"
+        )
+        self.n_added = 0
+
+    @property
+    def conn(self):
+        """
+        Connection of the calling thread, opened on first use.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # only this thread uses it, but close() may run on another
+            conn = self._local.conn = sqlite3.connect(
+                self.path, check_same_thread=False
+            )
+            with self._conns_lock:
+                self._conns.append(conn)
+        return conn
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM papers").fetchone()[0]
+
+    def __contains__(self, forum_id):
+        row = self.conn.execute("SELECT 1 FROM papers WHERE forum = ?", (forum_id,))
+        return row.fetchone() is not None
+
+    def venues(self):
+        return [
+            row[0] for row in self.conn.execute("SELECT DISTINCT venue FROM papers")
+        ]
+
+    def add(self, items):
+        """
+        Index (group, venue, paper) tuples, returning how many were new or changed.
+        """
+        n_added = 0
+        with self.conn:
+            for group, venue, paper in items:
+                tmdate = getattr(paper, "tmdate", None)
+                row = self.conn.execute(
+                    "SELECT id, tmdate FROM papers WHERE forum = ?", (paper.forum,)
+                ).fetchone()
+                if row is not None:
+                    if row[1] == tmdate and tmdate is not None:
+                        continue
+                    self.conn.execute(
+                        "DELETE FROM papers_fts WHERE rowid = ?", (row[0],)
+                    )
+                    self.conn.execute("DELETE FROM papers WHERE id = ?", (row[0],))
+                content = {
+                    field: unwrap(paper.content.get(field))
+                    for field in STORED_FIELDS
+                    if paper.content.get(field) is not None
+                }
+                cursor = self.conn.execute(
+                    "INSERT INTO papers (forum, grp, venue, tmdate, content) VALUES (?, ?, ?, ?, ?)",
+                    (paper.forum, group, venue, tmdate, json.dumps(content)),
+                )
+                keywords = content.get("keywords") or []
+                if isinstance(keywords, str):
+                    keywords = [keywords]
+                self.conn.execute(
+                    "INSERT INTO papers_fts (rowid, title, abstract, keywords) VALUES (?, ?, ?, ?)",
+                    (
+                        cursor.lastrowid,
+                        str(content.get("title") or ""),
+                        str(content.get("abstract") or ""),
+                        "\n".join(str(keyword) for keyword in keywords),
+                    ),
+                )
+                n_added += 1
+        self.n_added += n_added
+        return n_added
+
+    def add_papers(self, papers):
+        """
+        Index a dictionary of papers by group and venue, as returned by `get_papers`.
+        """
+        return self.add(
+            (group, venue, paper)
+            for group, grouped_venues in papers.items()
+            for venue, venue_papers in grouped_venues.items()
+            for paper in venue_papers
+        )
+
+    def iter_add(self, items, batch_size=500):
+        """
+        Index (group, venue, paper) tuples from an iterable while passing them
+        on, committing every batch_size papers.
+        """
+        batch = []
+        try:
+            for item in items:
+                batch.append(item)
+                if len(batch) >= batch_size:
+                    self.add(batch)
+                    batch = []
+                yield item
+        finally:
+            # also when the consumer stops early, e.g. a review ended with 'e'
+            if batch:
+                self.add(batch)
+
+    def search(
+        self,
+        keywords,
+        filter_mode="OR",
+        limit=100,
+        venues=None,
+        fields=INDEXED_FIELDS,
+        query=None,
+    ):
+        """
+        Papers matching keywords, best BM25 score first.
+
+        Args:
+          keywords: Keywords as for the Scraper: a list, or for MIX a list
+            of keywords and lists of alternatives
+          filter_mode: 'OR', 'AND' or 'MIX'
+          limit: Maximum number of results, None for all
+          venues: Only search these venue IDs
+          fields: Fields the keywords are looked for in
+          query: Raw FTS5 query used instead of keywords, e.g.
+            'NEAR("graph neural" attention, 5)'
+
+        Returns:
+          List of SearchResults; higher scores are better
+        """
+        if query is None:
+            query = match_expression(keywords, filter_mode, fields)
+        weights = ", ".join(str(weight) for weight in FIELD_WEIGHTS)
+        sql = (
+            f"SELECT papers.forum, papers.grp, papers.venue, papers.tmdate, "
+            f"papers.content, bm25(papers_fts, {weights}) AS rank "
+            "FROM papers_fts JOIN papers ON papers.id = papers_fts.rowid "
+            "WHERE papers_fts MATCH ?"
+        )
+        params = [query]
+        if venues is not None:
+            venues = list(venues)
+            if not venues:
+                return []
+            sql += f" AND papers.venue IN ({', '.join('?' * len(venues))})"
+            params += venues
+        sql += " ORDER BY rank"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [
+            SearchResult(
+                PaperRecord(forum, forum, json.loads(content), tmdate=tmdate),
+                group,
+                venue,
+                -rank,
+            )
+            for forum, group, venue, tmdate, content, rank in self.conn.execute(
+                sql, params
+            )
+        ]
+
+    def close(self):
+        with self._conns_lock:
+            conns, self._conns = self._conns, []
+        for conn in conns:
+            conn.close()
+        self._local = threading.local()
@@ -1,10 +1,107 @@
+import json
 import os
+import queue
+import shutil
+import threading
 from utils import papers_to_list
 
 
+class _End:
+  # put by the producer after the last item, with its error if it failed
+  def __init__(self, error=None):
+    self.error = error
+
+
+class Prefetcher:
+  """
+  Pulls items from an iterable in a background thread, up to `size` ahead of
+  the consumer, so whatever produces them (fetching, filtering, enrichment)
+  keeps running while the consumer is busy. Errors of the producer are
+  raised in the consumer.
+  """
+  def __init__(self, items, size=64):
+    self.items = items
+    self.queue = queue.Queue(maxsize=size)
+    self.stopped = threading.Event()
+    self.error = None
+    self.thread = threading.Thread(target=self._produce, daemon=True)
+    self.thread.start()
+
+  def _put(self, item):
+    while not self.stopped.is_set():
+      try:
+        self.queue.put(item, timeout=0.1)
+        return True
+      except queue.Full:
+        continue
+    return False
+
+  def _produce(self):
+    try:
+      for item in self.items:
+        if not self._put(item):
+          break
+    except BaseException as e:
+      self.error = e
+      self._put(_End(e))
+      return
+    finally:
+      close = getattr(self.items, 'close', None)
+      if self.stopped.is_set() and close is not None:
+        close()
+    self._put(_End())
+
+  def get(self, on_wait=None):
+    """
+    Next item; on_wait is called once if it is not there yet.
+    Raises StopIteration when the items are exhausted.
+    """
+    try:
+      item = self.queue.get_nowait()
+    except queue.Empty:
+      if on_wait is not None:
+        on_wait()
+      item = self.queue.get()
+    if isinstance(item, _End):
+      if item.error is not None:
+        self.error = None # raised here, not again by close
+        raise item.error
+      raise StopIteration
+    return item
+
+  def close(self):
+    """
+    Stop producing and wait for the producer thread to finish (it first
+    completes the item it is on), raising its error if it was never seen.
+    """
+    self.stopped.set()
+    self.thread.join()
+    if self.error is not None:
+      raise self.error
+
+
 class Selector:
-  def __init__(self, fields=None, options=None, start_idx=0):
-    self.idx = start_idx
+  """
+  Interactive review of scraped papers: each paper is shown and an option
+  is chosen for it ('y' selects it by default, 'e' exits).
+
+  With a decisions_path every decision is appended to that file as soon as
+  it is made, and papers decided in an earlier session are skipped, so a
+  review can be spread over several sessions. start_idx skips the first
+  papers regardless. stopped_early tells whether the last review was ended
+  ('e' or Ctrl-C) before every paper was seen.
+
+  Args:
+    fields: Fields of the extracted papers shown
+    options: Dictionary of option key -> {'desc', optional 'fn'}, where
+      fn(paper, selected_papers) acts on a paper chosen with that key
+    start_idx: Number of papers to skip
+    decisions_path: JSONL file decisions are saved to and resumed from
+    prefetch: Papers fetched ahead in the background by `review`
+  """
+  def __init__(self, fields=None, options=None, start_idx=0, decisions_path=None, prefetch=64):
+    self.idx = start_idx # position of the paper under review
+    self.start_idx = start_idx
     self.fields = fields if fields is not None else ['title', 'abstract']
     if options is None:
       self.options = {
@@ -19,40 +116,111 @@ class Selector:
     else:
       self.options = options
     self.options['e'] = {'desc':'exit'}
-  
+    self.options_str = '  '.join(f"{option}: {option_dict['desc']}" for option, option_dict in self.options.items()) + '  '
+    # the terminal is measured once, not for every paper
+    self.separator = '-'*shutil.get_terminal_size().columns
+    self.decisions_path = decisions_path
+    self.prefetch = prefetch
+    self.decisions = self.load_decisions()
+    self.stopped_early = False
+
   def __call__(self, papers):
     return self.select(papers)
-  
+
+  def load_decisions(self):
+    decisions = {}
+    if self.decisions_path is None or not os.path.exists(self.decisions_path):
+      return decisions
+    with open(self.decisions_path) as fp:
+      for line in fp:
+        try:
+          entry = json.loads(line)
+        except ValueError:
+          continue # a line cut short by an interrupted session
+        decisions[entry['key']] = entry['decision']
+    return decisions
+
+  def save_decision(self, key, decision):
+    self.decisions[key] = decision
+    if self.decisions_path is None:
+      return
+    with open(self.decisions_path, 'a') as fp:
+      fp.write(json.dumps({'key':key, 'decision':decision}) + '\n')
+
+  def paper_key(self, paper):
+    return str(paper.get('forum') or paper.get('title'))
+
   def select(self, papers):
-    os.system('clear') # i only support unix based systems
-    papers_list = papers_to_list(papers)
+    """
+    Review a dictionary of papers by group and venue, returning the selected ones.
+    Ctrl-C ends the review like 'e' does, keeping the papers selected so far.
+    """
     selected_papers = []
-    while self.idx<len(papers_list):
-      paper = papers_list[self.idx]
-      self.print_paper(paper)
-      decision = self.handle_options(paper, selected_papers)
-      if decision=='e': # e will be exit
-        print()
-        break
-      self.idx+=1
+    try:
+      for paper in self.review(papers_to_list(papers), background=False):
+        selected_papers.append(paper)
+    except KeyboardInterrupt:
+      print()
     return selected_papers
-  
+
+  def review(self, papers, background=True):
+    """
+    Review papers as they come from an iterable, e.g. Scraper.iter_papers,
+    yielding each selected paper as soon as it is chosen. With background,
+    the iterable is consumed ahead in a thread, so papers keep being fetched
+    and filtered while the current one is read.
+    """
+    os.system('clear') # i only support unix based systems
+    prefetcher = Prefetcher(papers, self.prefetch) if background else None
+    iterator = iter(papers) if prefetcher is None else None
+    waiting = lambda: print('\rWaiting for more papers...', end='', flush=True)
+    selected_papers = []
+    n_yielded = 0
+    position = -1
+    self.stopped_early = False
+    try:
+      while True:
+        try:
+          paper = next(iterator) if prefetcher is None else prefetcher.get(waiting)
+        except StopIteration:
+          break
+        position += 1
+        if position<self.start_idx:
+          continue
+        key = self.paper_key(paper)
+        if key in self.decisions:
+          continue
+        self.idx = position
+        self.print_paper(paper)
+        decision = self.handle_options(paper, selected_papers)
+        if decision=='e': # e will be exit
+          print()
+          self.stopped_early = True
+          break
+        # selected papers are handed on before the decision is saved, so a
+        # session cut short never records a paper that was not written
+        for selected_paper in selected_papers[n_yielded:]:
+          yield selected_paper
+        n_yielded = len(selected_papers)
+        self.save_decision(key, decision)
+        self.idx = position+1
+    except KeyboardInterrupt:
+      self.stopped_early = True
+      raise
+    finally:
+      if prefetcher is not None:
+        prefetcher.close()
+
   def print_paper(self, paper):
-    paper_str = ''
-    paper_str+='\n' + '-'*os.get_terminal_size().columns + '\n'
-    paper_str+=f'Paper {self.idx}\n'
-    for field in self.fields:
-      paper_str+=f'{field.upper()}: {paper[field]}\n'
-    print(f'\r{paper_str}', end='')
+    lines = ['', self.separator, f'Paper {self.idx}']
+    lines += [f'{field.upper()}: {paper[field]}' for field in self.fields]
+    print('\r' + '\n'.join(lines))
 
   def handle_options(self, paper, selected_papers):
-    options_str = ''
-    for option, option_dict in self.options.items():
-      options_str+=f"{option}: {option_dict['desc']}  "
-    decision = input(options_str)
+    decision = input(self.options_str)
     while decision not in self.options.keys():
       print("Invalid input!")
-      decision = input(options_str)
+      decision = input(self.options_str)
     if self.options[decision].get('fn') is not None:
       self.options[decision]['fn'](paper, selected_papers)
-    return decision
\ No newline at end of file
+    return decision
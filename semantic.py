@@ -0,0 +1,499 @@
+"""
+Semantic similarity filter: papers are matched to keywords by the cosine
+similarity of their embeddings instead of by fuzzy string matching, so
+synonyms and paraphrases match without listing every variant.
+
+Needs numpy; sentence-transformers is used for the embeddings if installed.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import zlib
+
+import numpy as np
+
+from record import unwrap
+
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:-[a-z0-9]+)*")
+
+
+def text_features(text, n_features, term_index=None):
+    """
+    Hashed unigram and bigram counts of a text, as (indices, sublinear tf).
+    `term_index` memoises the hash of each term.
+    """
+    term_index = {} if term_index is None else term_index
+    tokens = TOKEN_RE.findall(text.lower())
+    terms = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    counts = {}
+    for term in terms:
+        idx = term_index.get(term)
+        if idx is None:
+            idx = term_index[term] = zlib.crc32(term.encode()) % n_features
+        counts[idx] = counts.get(idx, 0) + 1
+    indices = np.fromiter(counts, dtype=np.int64, count=len(counts))
+    values = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+    return indices, 1 + np.log(values)
+
+
+def segment_products(ptr, gather, data, dense, chunk_nnz=2**15):
+    """
+    Row i of the result is the sum of data[j] * dense[gather[j]] over j in
+    ptr[i]:ptr[i + 1], i.e. a sparse matrix in compressed form times dense.
+    Works on about chunk_nnz nonzeros at a time, so the products stay in cache.
+    """
+    n_out = len(ptr) - 1
+    out = np.zeros((n_out, dense.shape[1]), dtype=np.float32)
+    nonempty = ptr[:-1] < ptr[1:]
+    bounds = np.unique(
+        np.concatenate(
+            [np.searchsorted(ptr, np.arange(0, ptr[-1], chunk_nnz)), [n_out]]
+        ).clip(0, n_out)
+    )
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        lo, hi = ptr[start], ptr[stop]
+        if lo == hi:
+            continue
+        products = data[lo:hi, None] * dense[gather[lo:hi]]
+        # reduceat needs in-range offsets; empty segments are masked out
+        offsets = np.minimum(ptr[start:stop] - lo, hi - lo - 1)
+        sums = np.add.reduceat(products, offsets, axis=0)
+        mask = nonempty[start:stop]
+        out[start:stop][mask] = sums[mask]
+    return out
+
+
+class SparseRows:
+    """
+    Sparse matrix stored by rows and by columns, with the two products the
+    randomized SVD needs.
+    """
+
+    def __init__(self, rows, n_cols):
+        self.n_rows = len(rows)
+        self.n_cols = n_cols
+        lengths = np.array([len(indices) for indices, _ in rows], dtype=np.int64)
+        self.indptr = np.concatenate([[0], np.cumsum(lengths)])
+        self.indices = np.concatenate(
+            [indices for indices, _ in rows] + [np.zeros(0, dtype=np.int64)]
+        ).astype(np.int64)
+        self.data = np.concatenate(
+            [data for _, data in rows] + [np.zeros(0, dtype=np.float32)]
+        ).astype(np.float32)
+        self._columns = None
+
+    def dot(self, dense):
+        """
+        X @ dense
+        """
+        return segment_products(self.indptr, self.indices, self.data, dense)
+
+    def tdot(self, dense):
+        """
+        X.T @ dense
+        """
+        if self._columns is None:
+            order = np.argsort(self.indices, kind="stable")
+            row_ids = np.repeat(np.arange(self.n_rows), np.diff(self.indptr))
+            counts = np.bincount(self.indices, minlength=self.n_cols)
+            colptr = np.concatenate([[0], np.cumsum(counts)])
+            self._columns = (colptr, row_ids[order], self.data[order])
+        colptr, row_ids, data = self._columns
+        return segment_products(colptr, row_ids, data, dense)
+
+
+class LSAEncoder:
+    """
+    TF-IDF + truncated SVD (latent semantic analysis) embeddings, needing
+    only numpy. Terms that occur in the same papers end up close, so "LLM"
+    lands near "large language model" once the corpus uses both.
+
+    The model is fitted by `fit` on a corpus of at least min_fit_docs texts
+    (SemanticFilter does so with the papers it is prepared with) and saved
+    to `path`; later runs load it, so cached embeddings stay valid. Encoding
+    before it is fitted is an error, since a model fitted on a handful of
+    texts would make every later similarity meaningless.
+
+    Args:
+      path: .npz file the fitted model is saved to
+      dim: Embedding dimension
+      n_features: Hashed vocabulary size
+      seed: Seed of the randomized SVD and of the fitting sample
+      max_fit_docs: Texts the model is fitted on; larger corpora are sampled
+      min_fit_docs: Fewest texts the model may be fitted on
+    """
+
+    default_threshold = 0.1
+
+    def __init__(
+        self,
+        path=".cache/embeddings/lsa.npz",
+        dim=128,
+        n_features=2**15,
+        seed=0,
+        max_fit_docs=10000,
+        min_fit_docs=100,
+    ):
+        self.path = path
+        self.dim = dim
+        self.n_features = n_features
+        self.seed = seed
+        self.max_fit_docs = max_fit_docs
+        self.min_fit_docs = min_fit_docs
+        self.idf = None
+        self.components = None
+        self.id = None
+        self._term_index = {}
+        if os.path.exists(path):
+            model = np.load(path)
+            if int(model.get("n_docs", 0)) < min_fit_docs:
+                # fitted on too few texts (or by an older version): refit
+                return
+            self.idf = model["idf"]
+            self.components = model["components"]
+            self.dim = self.components.shape[1]
+            self.n_features = self.components.shape[0]
+            self.id = str(model["id"])
+
+    @property
+    def fitted(self):
+        return self.components is not None
+
+    def _features(self, texts):
+        return [
+            text_features(text, self.n_features, self._term_index) for text in texts
+        ]
+
+    def _rows(self, features):
+        # tf-idf rows, l2-normalised
+        for indices, values in features:
+            weights = values * self.idf[indices]
+            norm = np.linalg.norm(weights)
+            yield indices, weights / norm if norm else weights
+
+    def fit(self, texts):
+        """
+        Fit the IDF weights and SVD components on a corpus and save them.
+        """
+        rng = np.random.default_rng(self.seed)
+        texts = list(texts)
+        if len(texts) < self.min_fit_docs:
+            raise ValueError(
+                f"LSAEncoder needs at least {self.min_fit_docs} texts to be fitted, "
+                f"got {len(texts)}; fit it on a corpus first, e.g. by running the "
+                "Scraper once with stream=False"
+            )
+        if self.max_fit_docs and len(texts) > self.max_fit_docs:
+            sample = rng.choice(len(texts), self.max_fit_docs, replace=False)
+            texts = [texts[i] for i in sorted(sample)]
+        features = self._features(texts)
+        n_docs = len(features)
+        df = np.zeros(self.n_features, dtype=np.float32)
+        for indices, _ in features:
+            df[indices] += 1
+        self.idf = (np.log((1 + n_docs) / (1 + df)) + 1).astype(np.float32)
+
+        # randomized SVD of the sparse doc-term matrix X: Y = X @ omega spans
+        # X's top singular directions, then B = Q.T @ X is small enough for
+        # an exact SVD; two power iterations sharpen the spectrum
+        rank = max(1, min(self.dim, n_docs - 1))
+        omega = rng.standard_normal((self.n_features, rank + 10), dtype=np.float32)
+        x = SparseRows(list(self._rows(features)), self.n_features)
+        y = x.dot(omega)
+        for _ in range(2):
+            q, _ = np.linalg.qr(y)
+            y = x.dot(x.tdot(q))
+        q, _ = np.linalg.qr(y)
+        b = x.tdot(q).T
+        _, _, vt = np.linalg.svd(b, full_matrices=False)
+        self.components = np.ascontiguousarray(vt[:rank].T, dtype=np.float32)
+        self.dim = rank
+        digest = hashlib.sha1(self.components.tobytes()).hexdigest()[:12]
+        self.id = f"lsa-{rank}-{digest}"
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        np.savez(
+            self.path,
+            idf=self.idf,
+            components=self.components,
+            id=self.id,
+            n_docs=n_docs,
+        )
+        return self
+
+    def encode(self, texts):
+        """
+        l2-normalised embeddings of texts, as a (len(texts), dim) array.
+        """
+        if not self.fitted:
+            raise ValueError("LSAEncoder is not fitted, call fit(texts) first")
+        x = SparseRows(list(self._rows(self._features(texts))), self.n_features)
+        vectors = x.dot(self.components)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms > 0, norms, 1)
+
+
+class SentenceTransformerEncoder:
+    """
+    Embeddings of a small local sentence-transformers model, run on CPU.
+
+    Args:
+      model_name: Model to load, e.g. all-MiniLM-L6-v2 (384 dims, ~90 MB)
+      batch_size: Texts per forward pass
+      device: Torch device
+    """
+
+    default_threshold = 0.35
+
+    def __init__(self, model_name="all-MiniLM-L6-v2", batch_size=64, device="cpu"):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name, device=device)
+        self.batch_size = batch_size
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.id = f"st-{model_name.replace('/', '_')}"
+        self.fitted = True
+
+    def encode(self, texts):
+        return self.model.encode(
+            list(texts),
+            batch_size=self.batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+        ).astype(np.float32)
+
+
+def default_encoder(cache_dir=".cache/embeddings"):
+    """
+    A sentence-transformers encoder if the package is installed, else LSA.
+    """
+    try:
+        return SentenceTransformerEncoder()
+    except ImportError:
+        return LSAEncoder(os.path.join(cache_dir, "lsa.npz"))
+
+
+class EmbeddingStore:
+    """
+    Embeddings cached per forum in a memory-mapped float32 array
+    (`vectors.f32`), with `index.jsonl` mapping each forum to its row and
+    a digest of the embedded text. A forum whose text changed is embedded
+    again into a new row.
+
+    Args:
+      root: Folder of the store, one per encoder
+      dim: Embedding dimension
+    """
+
+    def __init__(self, root, dim):
+        self.root = root
+        self.dim = dim
+        self.vectors_path = os.path.join(root, "vectors.f32")
+        self.index_path = os.path.join(root, "index.jsonl")
+        self.rows = {}
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self.n_rows = 0
+        if os.path.exists(self.vectors_path):
+            self.n_rows = os.path.getsize(self.vectors_path) // (4 * dim)
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as fp:
+                for line in fp:
+                    try:
+                        forum, row, digest = json.loads(line)
+                    except ValueError:
+                        continue
+                    if row < self.n_rows:
+                        self.rows[forum] = (row, digest)
+        self._matrix = None
+
+    def lookup(self, forum, digest):
+        entry = self.rows.get(forum)
+        if entry is None or entry[1] != digest:
+            return None
+        return entry[0]
+
+    def add(self, forums, digests, vectors):
+        """
+        Append vectors, returning their rows.
+        """
+        with self._lock:
+            first = self.n_rows
+            with open(self.vectors_path, "ab") as fp:
+                fp.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+            with open(self.index_path, "a") as fp:
+                for i, (forum, digest) in enumerate(zip(forums, digests)):
+                    self.rows[forum] = (first + i, digest)
+                    fp.write(json.dumps([forum, first + i, digest]) + "\n")
+            self.n_rows += len(forums)
+            self._matrix = None
+            return list(range(first, self.n_rows))
+
+    @property
+    def matrix(self):
+        """
+        Read-only memory map of every stored vector.
+        """
+        if self._matrix is None and self.n_rows:
+            self._matrix = np.memmap(
+                self.vectors_path,
+                dtype=np.float32,
+                mode="r",
+                shape=(self.n_rows, self.dim),
+            )
+        return self._matrix
+
+
+def paper_text(paper, fields):
+    parts = []
+    for field in fields:
+        value = unwrap(paper.content.get(field))
+        if isinstance(value, list):
+            value = ", ".join(str(item) for item in value)
+        if value:
+            parts.append(str(value))
+    return ". ".join(parts)
+
+
+class SemanticFilter:
+    """
+    Filter matching papers whose embedding has a cosine similarity of at
+    least `threshold` with a keyword's embedding:
+
+        scraper.add_filter(SemanticFilter(threshold=0.4))
+
+    It is called like any filter, with its name `semantic_filter` as the
+    filter type. The Scraper calls `prepare` with all papers before
+    filtering: papers not in the embedding cache are embedded in batches,
+    and each keyword is scored against all papers in one matrix multiply.
+    Papers the filter was not prepared with (e.g. when streaming) are
+    embedded and scored one by one, still through the cache; that needs an
+    encoder that is already fitted, which for LSA means a run that prepared
+    the filter (stream=False) or a call to `encoder.fit`.
+
+    Args:
+      encoder: LSAEncoder, SentenceTransformerEncoder or anything with
+        `encode(texts)`, `dim`, `id` and `default_threshold`; by default
+        sentence-transformers if installed, else LSA
+      threshold: Minimum cosine similarity, by default the encoder's
+      fields: Content fields embedded, joined
+      cache_dir: Folder of the embedding caches, one per encoder
+      batch_size: Papers embedded per batch
+    """
+
+    __name__ = "semantic_filter"
+
+    def __init__(
+        self,
+        encoder=None,
+        threshold=None,
+        fields=("title", "abstract"),
+        cache_dir=".cache/embeddings",
+        batch_size=256,
+    ):
+        self.encoder = encoder or default_encoder(cache_dir)
+        self.threshold = threshold
+        self.fields = fields
+        self.cache_dir = cache_dir
+        self.batch_size = batch_size
+        self.store = None
+        self.positions = {}
+        self.matrix = None
+        self.scores = None
+        self.keyword_columns = {}
+        self.keyword_vectors = {}
+        self._lock = threading.Lock()
+
+    def _open_store(self):
+        if self.store is None:
+            self.store = EmbeddingStore(
+                os.path.join(self.cache_dir, self.encoder.id), self.encoder.dim
+            )
+        return self.store
+
+    def _embed(self, papers):
+        """
+        Rows in the store of the papers' embeddings, embedding the missing ones.
+        """
+        texts = [paper_text(paper, self.fields) for paper in papers]
+        digests = [hashlib.sha1(text.encode()).hexdigest()[:16] for text in texts]
+        if not getattr(self.encoder, "fitted", True):
+            # fit on the corpus at hand before the store is keyed by the model;
+            # this refuses too few texts, e.g. a single unprepared paper
+            self.encoder.fit(texts)
+        store = self._open_store()
+        rows = [
+            store.lookup(paper.forum, digest) for paper, digest in zip(papers, digests)
+        ]
+        todo = [i for i, row in enumerate(rows) if row is None]
+        for start in range(0, len(todo), self.batch_size):
+            batch = todo[start : start + self.batch_size]
+            vectors = self.encoder.encode([texts[i] for i in batch])
+            new_rows = store.add(
+                [papers[i].forum for i in batch], [digests[i] for i in batch], vectors
+            )
+            for i, row in zip(batch, new_rows):
+                rows[i] = row
+        return rows
+
+    def _keyword_vector(self, keyword):
+        if keyword not in self.keyword_vectors:
+            self.keyword_vectors[keyword] = self.encoder.encode([keyword])[0]
+        return self.keyword_vectors[keyword]
+
+    def prepare(self, papers, keywords=None):
+        """
+        Embed papers (cached ones are only read) and, if keywords are given,
+        score them all against every keyword at once.
+        """
+        papers = list(papers)
+        if not papers:
+            return
+        rows = self._embed(papers)
+        with self._lock:
+            self.positions = {paper.forum: i for i, paper in enumerate(papers)}
+            self.matrix = self.store.matrix[np.asarray(rows)]
+            self.scores = None
+            self.keyword_columns = {}
+        if keywords:
+            self._score_keywords([str(kw) for kw in keywords])
+
+    def _score_keywords(self, keywords):
+        with self._lock:
+            new = [
+                kw for kw in dict.fromkeys(keywords) if kw not in self.keyword_columns
+            ]
+            if not new:
+                return
+            queries = np.stack([self._keyword_vector(kw) for kw in new])
+            scores = self.matrix @ queries.T
+            offset = 0 if self.scores is None else self.scores.shape[1]
+            self.scores = (
+                scores if self.scores is None else np.hstack([self.scores, scores])
+            )
+            for i, kw in enumerate(new):
+                self.keyword_columns[kw] = offset + i
+
+    def similarity(self, paper, keyword):
+        keyword = str(keyword)
+        pos = self.positions.get(paper.forum)
+        if pos is None:
+            row = self._embed([paper])[0]
+            return float(self.store.matrix[row] @ self._keyword_vector(keyword))
+        if keyword not in self.keyword_columns:
+            self._score_keywords([keyword])
+        return float(self.scores[pos, self.keyword_columns[keyword]])
+
+    def __call__(self, paper, keywords, threshold=None):
+        if threshold is None:
+            threshold = self.threshold
+        if threshold is None:
+            threshold = self.encoder.default_threshold
+        for keyword in keywords:
+            if keyword is None or not str(keyword).strip():
+                continue
+            if self.similarity(paper, keyword) >= threshold:
+                return keyword, True
+        return None, False
@@ -0,0 +1,120 @@
+import csv
+import gzip
+import json
+import os
+import time
+
+
+class CSVSink:
+    """
+    Append-only CSV writer that costs time proportional to the rows written.
+
+    Whether the file already has a header is decided from its size, and its
+    columns come from a `<fpath>.schema.json` sidecar (or just the first line
+    of older files), so the existing contents are never read. Rows are
+    buffered and written in batches. Columns are the union of the keys of
+    every row. If a run adds a column the existing file lacks, the file is
+    rewritten once with the wider header. Paths ending in `.gz` are written
+    as gzip members appended to the file.
+
+    Args:
+      fpath: Output CSV path
+      batch_size: Number of rows buffered before they are written
+      flush_interval: Seconds after which buffered rows are written anyway,
+        None to only write full batches
+      on_flush: Optional function called with the number of rows each time
+        buffered rows have been written
+    """
+
+    def __init__(self, fpath, batch_size=500, flush_interval=None, on_flush=None):
+        self.fpath = fpath
+        self.schema_path = f"{fpath}.schema.json"
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.on_flush = on_flush
+        self.compressed = fpath.endswith(".gz")
+        self.rows = []
+        self.n_rows = 0
+        self.last_flush = time.monotonic()
+        self.has_header = os.path.exists(fpath) and os.path.getsize(fpath) > 0
+        self.fieldnames = self._read_fieldnames() if self.has_header else []
+        self.file_fieldnames = list(self.fieldnames)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _open(self, mode):
+        if self.compressed:
+            return gzip.open(self.fpath, mode + "t", newline="")
+        return open(self.fpath, mode, newline="")
+
+    def _read_fieldnames(self):
+        try:
+            with open(self.schema_path) as fp:
+                return json.load(fp)["fieldnames"]
+        except (OSError, ValueError, KeyError):
+            pass
+        with self._open("r") as fp:
+            return next(csv.reader(fp), [])
+
+    def _write_schema(self):
+        with open(self.schema_path, "w") as fp:
+            json.dump({"fieldnames": self.fieldnames}, fp)
+
+    def _widen_file(self):
+        """
+        Rewrite the existing file under the current, wider header.
+        """
+        tmp_path = f"{self.fpath}.tmp"
+        with self._open("r") as src:
+            reader = csv.DictReader(src)
+            if self.compressed:
+                dst = gzip.open(tmp_path, "wt", newline="")
+            else:
+                dst = open(tmp_path, "w", newline="")
+            with dst:
+                writer = csv.DictWriter(dst, fieldnames=self.fieldnames, restval="")
+                writer.writeheader()
+                writer.writerows(reader)
+        os.replace(tmp_path, self.fpath)
+
+    def write(self, row):
+        for key in row:
+            if key not in self.fieldnames:
+                self.fieldnames.append(key)
+        self.rows.append(row)
+        self.n_rows += 1
+        if len(self.rows) >= self.batch_size or (
+            self.flush_interval is not None
+            and time.monotonic() - self.last_flush >= self.flush_interval
+        ):
+            self.flush()
+
+    def write_rows(self, rows):
+        for row in rows:
+            self.write(row)
+
+    def flush(self):
+        self.last_flush = time.monotonic()
+        if not self.rows:
+            return
+        if self.has_header and self.fieldnames != self.file_fieldnames:
+            self._widen_file()
+        with self._open("a") as fp:
+            writer = csv.DictWriter(fp, fieldnames=self.fieldnames, restval="")
+            if not self.has_header:
+                writer.writeheader()
+            writer.writerows(self.rows)
+        if self.fieldnames != self.file_fieldnames or not self.has_header:
+            self._write_schema()
+        self.has_header = True
+        self.file_fieldnames = list(self.fieldnames)
+        if self.on_flush is not None:
+            self.on_flush(len(self.rows))
+        self.rows = []
+
+    def close(self):
+        self.flush()
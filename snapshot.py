@@ -0,0 +1,152 @@
+import json
+import os
+import zlib
+
+from utils import unwrap_value
+
+COLUMNS = [
+    "forum",
+    "venue",
+    "group",
+    "year",
+    "title",
+    "abstract",
+    "keywords",
+    "authors",
+    "pdf",
+    "tmdate",
+]
+CONTENT_COLUMNS = ["title", "abstract", "keywords", "authors", "pdf"]
+
+
+class SnapshotPaper:
+    """
+    Paper loaded from a snapshot, with the attributes filters and extractors read.
+    """
+
+    __slots__ = ("id", "forum", "tmdate", "content")
+
+    def __init__(self, forum, tmdate, content):
+        self.id = forum
+        self.forum = forum
+        self.tmdate = tmdate
+        self.content = content
+
+    def copy(self):
+        return SnapshotPaper(self.forum, self.tmdate, dict(self.content))
+
+
+def paper_columns(paper, group, venue):
+    venue_split = venue.split("/")
+    row = {
+        "forum": paper.forum,
+        "venue": venue_split[0],
+        "group": group,
+        "year": venue_split[1] if len(venue_split) > 1 else None,
+        "tmdate": getattr(paper, "tmdate", None),
+    }
+    for column in CONTENT_COLUMNS:
+        row[column] = unwrap_value(paper.content.get(column))
+    return row
+
+
+def save_snapshot(papers, fpath):
+    """
+    Save papers as a columnar snapshot.
+
+    The snapshot is a folder with `data.bin`, holding one zlib-compressed
+    JSON list per (venue, column), and `index.json`, holding the offset and
+    length of every block. So a venue or a column can be read without
+    touching the rest of the file.
+
+    Args:
+      papers: Dictionary of papers by group and venue
+      fpath: Folder to write the snapshot to
+    """
+    os.makedirs(fpath, exist_ok=True)
+    index = {"columns": COLUMNS, "venues": []}
+    with open(os.path.join(fpath, "data.bin"), "wb") as fp:
+        for group, grouped_venues in papers.items():
+            for venue, venue_papers in grouped_venues.items():
+                rows = [paper_columns(paper, group, venue) for paper in venue_papers]
+                blocks = {}
+                for column in COLUMNS:
+                    data = zlib.compress(
+                        json.dumps([row[column] for row in rows]).encode()
+                    )
+                    blocks[column] = [fp.tell(), len(data)]
+                    fp.write(data)
+                index["venues"].append(
+                    {
+                        "group": group,
+                        "venue": venue,
+                        "count": len(rows),
+                        "blocks": blocks,
+                    }
+                )
+    with open(os.path.join(fpath, "index.json"), "w") as fp:
+        json.dump(index, fp)
+
+
+class Snapshot:
+    """
+    Lazily loaded snapshot written by `save_snapshot`. Only the index is read
+    up front; venue columns are read and decompressed on demand.
+    """
+
+    def __init__(self, fpath):
+        self.fpath = fpath
+        with open(os.path.join(fpath, "index.json")) as fp:
+            index = json.load(fp)
+        self.columns = index["columns"]
+        self.entries = index["venues"]
+
+    @property
+    def venues(self):
+        return [(entry["group"], entry["venue"]) for entry in self.entries]
+
+    def __len__(self):
+        return sum(entry["count"] for entry in self.entries)
+
+    def read_columns(self, venues=None, columns=None):
+        """
+        Yields (group, venue, {column: values}) for the requested venues,
+        reading only the requested columns.
+        """
+        columns = columns or self.columns
+        with open(os.path.join(self.fpath, "data.bin"), "rb") as fp:
+            for entry in self.entries:
+                if venues is not None and entry["venue"] not in venues:
+                    continue
+                data = {}
+                for column in columns:
+                    offset, length = entry["blocks"][column]
+                    fp.seek(offset)
+                    data[column] = json.loads(zlib.decompress(fp.read(length)))
+                yield entry["group"], entry["venue"], data
+
+    def papers(self, venues=None, columns=None):
+        """
+        Returns a dictionary by group and venue of SnapshotPaper objects,
+        as `get_papers` would.
+        """
+        if columns is not None:
+            columns = list(dict.fromkeys(["forum", "tmdate"] + list(columns)))
+        papers = {}
+        for group, venue, data in self.read_columns(venues, columns):
+            content_columns = [c for c in CONTENT_COLUMNS if c in data]
+            if content_columns:
+                contents = zip(*(data[column] for column in content_columns))
+            else:
+                contents = [()] * len(data["forum"])
+            papers.setdefault(group, {})[venue] = [
+                SnapshotPaper(forum, tmdate, dict(zip(content_columns, values)))
+                for forum, tmdate, values in zip(
+                    data["forum"], data["tmdate"], contents
+                )
+            ]
+        return papers
+
+
+def load_snapshot(fpath, venues=None, columns=None):
+    return Snapshot(fpath).papers(venues=venues, columns=columns)
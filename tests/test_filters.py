@@ -0,0 +1,106 @@
+import random
+
+import pytest
+
+from filters import (
+    KeywordMatcher,
+    abstract_filter,
+    keywords_filter,
+    satisfies_all_filters,
+    satisfies_any_filters,
+    satisfies_mixed_filters,
+    title_filter,
+)
+from prefilter import KeywordPrefilter
+
+REFERENCE = {
+    "OR": satisfies_any_filters,
+    "AND": satisfies_all_filters,
+    "MIX": satisfies_mixed_filters,
+}
+WORDS = [
+    "large", "language", "model", "LLM", "llm", "game", "theory", "nash",
+    "equilibrium", "rl", "Reinforcement", "learning", "multi-agent", "graph",
+    "neural", "net", "a", "the", "of",
+]  # fmt: skip
+KEYWORDS = [
+    "Large Language Model", "LLM", "Game Theory", "equilibrium", "Nash", "RL",
+    "Multi-Agent", "graph neural", "", "  ", None, "learning",
+]  # fmt: skip
+
+
+class Paper:
+    def __init__(self, content):
+        self.content = content
+        self.forum = str(id(self))
+
+
+def substring_filter(paper, keywords):
+    title = (paper.content.get("title") or "").lower()
+    for keyword in keywords:
+        if keyword and str(keyword).lower() in title:
+            return keyword, True
+    return None, False
+
+
+def random_case(rng):
+    text = lambda n: " ".join(rng.choice(WORDS) for _ in range(n))
+    content = {}
+    if rng.random() < 0.9:
+        content["title"] = text(rng.randint(0, 8))
+    if rng.random() < 0.9:
+        content["abstract"] = text(rng.randint(0, 60))
+    r = rng.random()
+    if r < 0.6:
+        content["keywords"] = [
+            text(rng.randint(1, 3)) for _ in range(rng.randint(0, 4))
+        ]
+    elif r < 0.7:
+        content["keywords"] = text(2)
+    filters = [
+        (title_filter, (), {}),
+        (keywords_filter, (), {}),
+        (abstract_filter, (), {"threshold": rng.choice([70, 85, 95])}),
+        (substring_filter, (), {}),
+    ]
+    rng.shuffle(filters)
+    filters = filters[: rng.randint(1, 4)]
+    mode = rng.choice(sorted(REFERENCE))
+    if mode == "MIX":
+        keywords = [
+            (
+                rng.choice(KEYWORDS)
+                if rng.random() < 0.4
+                else rng.sample(KEYWORDS, rng.randint(1, 3))
+            )
+            for _ in range(rng.randint(1, 3))
+        ]
+    else:
+        keywords = rng.sample(KEYWORDS, rng.randint(1, 4))
+    return Paper(content), keywords, filters, mode
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_matcher_matches_the_fuzzy_functions(seed):
+    rng = random.Random(seed)
+    for _ in range(500):
+        paper, keywords, filters, mode = random_case(rng)
+        expected = REFERENCE[mode](paper, keywords, filters)
+        assert KeywordMatcher(keywords, filters, mode).match(paper) == expected
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_prefilter_never_rejects_a_match(seed):
+    rng = random.Random(seed)
+    for _ in range(500):
+        paper, keywords, filters, mode = random_case(rng)
+        matcher = KeywordMatcher(keywords, filters, mode)
+        if matcher.match(paper)[2]:
+            assert KeywordPrefilter(matcher).may_match(paper)
+
+
+def test_prefilter_rejects_unrelated_papers():
+    matcher = KeywordMatcher(["game theory"], [(title_filter, (), {})], "OR")
+    paper = Paper({"title": "Protein folding with diffusion"})
+    assert not matcher.match(paper)[2]
+    assert not KeywordPrefilter(matcher).may_match(paper)
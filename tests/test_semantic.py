@@ -0,0 +1,57 @@
+import os
+import random
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from record import PaperRecord
+from scraper import Scraper
+from semantic import LSAEncoder, SemanticFilter
+
+TOPICS = [
+    "game theory nash equilibrium agents auctions",
+    "graph neural networks message passing molecules",
+    "reinforcement learning policy gradient reward",
+    "language models transformers pretraining tokens",
+]
+
+
+def make_papers(n, seed=0):
+    rng = random.Random(seed)
+    papers = []
+    for i in range(n):
+        words = rng.choice(TOPICS).split() + rng.choice(TOPICS).split()[:2]
+        rng.shuffle(words)
+        content = {"title": " ".join(words[:4]), "abstract": " ".join(words)}
+        papers.append(PaperRecord(id=f"p{i}", forum=f"p{i}", content=content))
+    return {"G": {"V": papers}}
+
+
+def match(tmp_path, papers, n_jobs):
+    cache_dir = os.path.join(tmp_path, f"jobs{n_jobs}")
+    scraper = Scraper(
+        ["V"],
+        ["2024"],
+        ["nash equilibrium", "message passing"],
+        None,
+        os.path.join(tmp_path, "out.csv"),
+        n_jobs=n_jobs,
+        snapshot=os.path.join(tmp_path, "unused.snap"),
+        venue_cache=None,
+    )
+    encoder = LSAEncoder(os.path.join(cache_dir, "lsa.npz"), dim=16)
+    scraper.add_filter(SemanticFilter(encoder, threshold=0.5, cache_dir=cache_dir))
+    matched = scraper.match_papers(papers)
+    return [(paper.forum, keyword) for paper, keyword, _ in matched["G"]["V"]]
+
+
+@pytest.mark.skipif(
+    __import__("multiprocessing").get_start_method() != "fork",
+    reason="prepared filters reach the workers by fork",
+)
+def test_parallel_filtering_prepares_the_semantic_filter(tmp_path):
+    papers = make_papers(300)
+    serial = match(tmp_path, papers, n_jobs=1)
+    assert serial
+    assert match(tmp_path, papers, n_jobs=2) == serial
@@ -0,0 +1,37 @@
+import csv
+import json
+import os
+
+from forum_index import ForumIndex
+from sink import CSVSink
+
+
+def read_rows(fpath):
+    with open(fpath, newline="") as fp:
+        return list(csv.DictReader(fp))
+
+
+def test_appending_rows_with_a_new_column_widens_the_file(tmp_path):
+    fpath = os.path.join(tmp_path, "papers.csv")
+    with CSVSink(fpath) as sink:
+        sink.write_rows([{"forum": "a", "title": "A"}])
+    with CSVSink(fpath) as sink:
+        assert sink.fieldnames == ["forum", "title"]
+        sink.write_rows([{"forum": "b", "title": "B", "pdf": "b.pdf"}])
+    with open(f"{fpath}.schema.json") as fp:
+        assert json.load(fp)["fieldnames"] == ["forum", "title", "pdf"]
+    assert read_rows(fpath) == [
+        {"forum": "a", "title": "A", "pdf": ""},
+        {"forum": "b", "title": "B", "pdf": "b.pdf"},
+    ]
+
+
+def test_forum_index_remembers_exported_forums(tmp_path):
+    fpath = os.path.join(tmp_path, "papers.csv")
+    index = ForumIndex(fpath)
+    index.add(["a", "b", "a"])
+    index.close()
+    index = ForumIndex(fpath)
+    assert "a" in index and "b" in index and "c" not in index
+    assert len(index) == 2
+    index.close()
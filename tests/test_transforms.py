@@ -0,0 +1,70 @@
+import threading
+import time
+
+import pytest
+
+from metrics import QuietReporter
+from record import PaperRecord
+from transforms import TransformRunner, transform
+
+
+def make_paper(forum):
+    return PaperRecord(id=forum, forum=forum, content={"title": forum})
+
+
+def test_hanging_io_calls_do_not_block_later_papers():
+    release = threading.Event()
+
+    @transform("io", timeout=0.2, max_concurrency=2)
+    def hang(paper):
+        if paper.forum.startswith("hang"):
+            release.wait(10)
+        paper.content["done"] = True
+        return paper
+
+    papers = [make_paper("hang0"), make_paper("hang1")]
+    papers += [make_paper(f"ok{i}") for i in range(4)]
+    start = time.perf_counter()
+    try:
+        with TransformRunner([hang], max_workers=4, reporter=QuietReporter()) as runner:
+            results = [paper for _, paper in runner.imap(papers)]
+    finally:
+        release.set()
+    assert time.perf_counter() - start < 5
+    assert [paper.forum for paper in results] == [paper.forum for paper in papers]
+
+
+def test_timed_out_call_does_not_change_the_paper():
+    finish = threading.Event()
+    finished = threading.Event()
+
+    @transform("io", timeout=0.1)
+    def late(paper):
+        finish.wait(10)
+        paper.content["late"] = True
+        finished.set()
+        return paper
+
+    paper = make_paper("a")
+    with TransformRunner([late], reporter=QuietReporter()) as runner:
+        result = runner.apply(paper)
+        finish.set()
+        finished.wait(5)
+    assert result is paper
+    assert "late" not in paper.content
+
+
+def failing(paper):
+    raise RuntimeError("boom")
+
+
+@pytest.mark.parametrize("declared", [False, True])
+def test_errors_policy_is_the_same_with_and_without_declared_fns(declared):
+    fns = [failing]
+    if declared:
+        fns.append(transform("io")(lambda paper: paper))
+    with TransformRunner(fns, reporter=QuietReporter()) as runner:
+        with pytest.raises(RuntimeError):
+            runner.apply(make_paper("a"))
+    with TransformRunner(fns, reporter=QuietReporter(), errors="report") as runner:
+        assert runner.apply(make_paper("a")).forum == "a"
@@ -0,0 +1,231 @@
+import asyncio
+import copy
+import inspect
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from metrics import NULL_METRICS, PRINT_REPORTER
+
+KINDS = ("sync", "io", "cpu", "async")
+ERRORS = ("raise", "report")
+
+
+class TransformSpec:
+    """
+    How a transform fn is scheduled.
+
+    Args:
+      fn: Function taking a paper and returning the (modified) paper
+      kind: "sync" runs one call at a time, like a plain fn; "io" runs in a
+        thread pool of its own; "cpu" runs in a process pool (fn and paper
+        must be picklable); "async" is a coroutine function run on an event loop
+      timeout: Seconds after which the paper moves on without this fn's
+        result, None to wait forever
+      max_concurrency: Maximum number of concurrent calls of this fn, None
+        for the runner's max_workers
+    """
+
+    def __init__(self, fn, kind="sync", timeout=None, max_concurrency=None):
+        if kind not in KINDS:
+            raise ValueError(f"kind must be one of {KINDS}, got {kind!r}")
+        self.fn = fn
+        self.kind = kind
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.name = getattr(fn, "__name__", repr(fn))
+
+
+def transform(kind="io", timeout=None, max_concurrency=None):
+    """
+    Declare how a fn passed to `Scraper(fns=...)` is scheduled:
+
+        @transform("io", timeout=30, max_concurrency=8)
+        def add_citations(paper):
+            ...
+
+    The fn itself is returned unchanged, so it can still be called directly.
+    """
+
+    def decorator(fn):
+        fn.transform_spec = TransformSpec(fn, kind, timeout, max_concurrency)
+        return fn
+
+    return decorator
+
+
+def get_spec(fn):
+    spec = getattr(fn, "transform_spec", None)
+    if spec is not None:
+        return spec
+    if inspect.iscoroutinefunction(fn):
+        return TransformSpec(fn, "async")
+    return TransformSpec(fn, "sync")
+
+
+class TransformRunner:
+    """
+    Runs the chain of transform fns on papers, overlapping papers with each
+    other and with whatever produces them, while yielding results in input
+    order.
+
+    The fns of one paper always run in order. Papers are run by up to
+    max_workers driver threads; each fn is then scheduled according to its
+    TransformSpec. If every fn is "sync" (plain undeclared fns) the chain runs
+    inline, exactly as a loop over the fns would.
+
+    A fn that times out is skipped for that paper, which continues down the
+    chain as it was; the timeout is reported. Waiting for a free slot of the
+    fn (max_concurrency) counts against its timeout. "io" and "async" fns
+    run on a copy of the paper: a timed-out call may still finish in the
+    background, holding its slot until then, but its result is dropped.
+    A fn that raises is handled the same way for every kind, as `errors`
+    says.
+
+    Args:
+      fns: Transform fns, plain or declared with `transform`
+      max_workers: Papers in flight at once
+      n_procs: Processes for "cpu" fns, None for the CPU count
+      metrics: Optional Metrics recording the time of every fn
+      reporter: Optional ProgressReporter errors are reported to
+      errors: "raise" to stop on the first fn that raises, as a loop over
+        the fns would; "report" to skip the fn for that paper and report it
+    """
+
+    def __init__(
+        self,
+        fns,
+        max_workers=8,
+        n_procs=None,
+        metrics=None,
+        reporter=None,
+        errors="raise",
+    ):
+        if errors not in ERRORS:
+            raise ValueError(f"errors must be one of {ERRORS}, got {errors!r}")
+        self.specs = [get_spec(fn) for fn in fns]
+        self.errors = errors
+        self.max_workers = max_workers
+        self.n_procs = n_procs
+        self.metrics = metrics or NULL_METRICS
+        self.reporter = reporter or PRINT_REPORTER
+        self.inline = all(spec.kind == "sync" for spec in self.specs)
+        self._sync_lock = threading.Lock()
+        self._executors = {}
+        self._limits = {}
+        self._process_pool = None
+        self._loop = None
+        self._loop_thread = None
+
+    def __enter__(self):
+        if self.inline:
+            return self
+        for spec in self.specs:
+            if spec.kind == "sync":
+                continue
+            limit = spec.max_concurrency or self.max_workers
+            self._limits[id(spec)] = threading.BoundedSemaphore(limit)
+            if spec.kind == "io":
+                self._executors[id(spec)] = ThreadPoolExecutor(max_workers=limit)
+        if any(spec.kind == "cpu" for spec in self.specs):
+            self._process_pool = ProcessPoolExecutor(max_workers=self.n_procs)
+        if any(spec.kind == "async" for spec in self.specs):
+            self._loop = asyncio.new_event_loop()
+            self._loop_thread = threading.Thread(
+                target=self._loop.run_forever, daemon=True
+            )
+            self._loop_thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        for executor in self._executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
+        self._executors = {}
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+            self._process_pool = None
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop_thread.join()
+            self._loop.close()
+            self._loop = None
+
+    def _call(self, spec, paper):
+        if spec.kind == "sync":
+            if self.inline:
+                return spec.fn(paper)
+            with self._sync_lock:
+                return spec.fn(paper)
+        limit = self._limits[id(spec)]
+        # a slot is held until the call returns, even after it timed out, so
+        # calls of a fn that hangs never pile up behind each other
+        if not limit.acquire(timeout=spec.timeout):
+            raise FutureTimeoutError()
+        try:
+            if spec.kind == "io":
+                future = self._executors[id(spec)].submit(spec.fn, copy.deepcopy(paper))
+            elif spec.kind == "cpu":
+                future = self._process_pool.submit(spec.fn, paper)
+            else:
+                future = asyncio.run_coroutine_threadsafe(
+                    spec.fn(copy.deepcopy(paper)), self._loop
+                )
+        except BaseException:
+            limit.release()
+            raise
+        future.add_done_callback(lambda future: limit.release())
+        try:
+            return future.result(timeout=spec.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise
+
+    def apply(self, paper):
+        """
+        Run every fn on a paper, in order, returning the transformed paper.
+        """
+        for spec in self.specs:
+            start = time.perf_counter()
+            try:
+                paper = self._call(spec, paper)
+            except FutureTimeoutError:
+                self.metrics.inc("transform_timeouts", fn=spec.name)
+                self.reporter.error(
+                    f"Transform {spec.name} timed out after {spec.timeout}s on "
+                    f"{getattr(paper, 'forum', paper)}"
+                )
+            except Exception as e:
+                if self.errors == "raise":
+                    raise
+                self.metrics.inc("transform_errors", fn=spec.name)
+                self.reporter.error(
+                    f"Transform {spec.name} failed on {getattr(paper, 'forum', paper)}: {e}"
+                )
+            finally:
+                self.metrics.observe(
+                    "fn_seconds", time.perf_counter() - start, fn=spec.name
+                )
+        return paper
+
+    def imap(self, items, paper_of=lambda item: item):
+        """
+        Yield (item, transformed paper) for each item in order, with at most
+        max_workers papers in flight. Must be used inside `with runner:`
+        unless every fn is "sync".
+        """
+        if self.inline:
+            for item in items:
+                yield item, self.apply(paper_of(item))
+            return
+        with ThreadPoolExecutor(max_workers=self.max_workers) as drivers:
+            in_flight = deque()
+            for item in items:
+                in_flight.append((item, drivers.submit(self.apply, paper_of(item))))
+                if len(in_flight) >= self.max_workers:
+                    item, future = in_flight.popleft()
+                    yield item, future.result()
+            while in_flight:
+                item, future = in_flight.popleft()
+                yield item, future.result()
@@ -0,0 +1,325 @@
+import email.utils
+import json
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import NULL_METRICS
+
+# Requests per second per host. Conservative defaults for OpenReview; a host
+# that answers 429 is slowed down further until it stops complaining
+DEFAULT_RATES = {
+    "api.openreview.net": 5.0,
+    "api2.openreview.net": 5.0,
+    "openreview.net": 5.0,
+}
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+RETRY_METHODS = {"GET", "HEAD"}
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """
+    Raised without sending a request while a host's circuit is open.
+    """
+
+
+def retry_after(response):
+    """
+    Seconds asked for by a Retry-After header (delay or HTTP date), or None.
+    """
+    value = response.headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, date.timestamp() - time.time())
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. `acquire` reserves a token and sleeps until it
+    is due, so concurrent callers are spaced out at `rate` per second.
+
+    The rate is adaptive: `throttle` halves it (down to `min_rate`) and
+    `recover` adds back a twentieth of the configured rate per success.
+    """
+
+    def __init__(self, rate, burst=None, min_rate=0.5):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.burst = burst or max(1.0, rate)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def throttle(self):
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = min(self.tokens, 0.0)
+
+    def recover(self):
+        if self.rate >= self.max_rate:
+            return
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failed requests to a host and then
+    rejects requests for `cooldown` seconds. After the cooldown a single
+    trial request is let through; it closes the circuit on success and
+    reopens it on failure.
+    """
+
+    def __init__(self, threshold=5, cooldown=60.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.cooldown:
+            return "open"
+        return "half-open"
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.cooldown or self.trial:
+                return False
+            self.trial = True
+            return True
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial = False
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.trial or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+            self.trial = False
+
+
+class FailureLog:
+    """
+    Thread-safe list of the items (venues, PDFs, BibTeX entries) that could
+    not be fetched, so they can be reported or retried instead of being lost
+    in the console output.
+    """
+
+    def __init__(self):
+        self.entries = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter(list(self.entries))
+
+    def record(self, kind, item, error, **info):
+        if isinstance(error, BaseException):
+            error = f"{type(error).__name__}: {error}"
+        entry = {"kind": kind, "item": item, "error": str(error), "time": time.time()}
+        entry.update(info)
+        with self._lock:
+            self.entries.append(entry)
+
+    def counts(self):
+        counts = {}
+        for entry in self:
+            counts[entry["kind"]] = counts.get(entry["kind"], 0) + 1
+        return counts
+
+    def save(self, fpath):
+        with open(fpath, "w") as fp:
+            json.dump(list(self), fp, indent=2)
+
+
+class ThrottledSession(requests.Session):
+    """
+    requests session whose requests go through a Transport.
+    """
+
+    def __init__(self, transport, pool_size=10):
+        super().__init__()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+        self.transport = transport
+
+    def request(self, method, url, *args, **kwargs):
+        return self.transport.request(super().request, method, url, *args, **kwargs)
+
+
+class Transport:
+    """
+    Shared HTTP layer: per-host adaptive rate limiting, retries with jittered
+    exponential backoff that honour Retry-After, a per-host circuit breaker
+    and a log of failed items.
+
+    Only GET and HEAD are retried. A request that still gets 429/5xx after
+    the last retry returns that response, as plain requests would.
+
+    Args:
+      rates: Requests per second by host, on top of DEFAULT_RATES
+      default_rate: Requests per second for hosts not in rates
+      retries: Retries on connection errors, timeouts, 429 and 5xx
+      backoff_factor: Base delay of the exponential backoff
+      max_backoff: Longest backoff between retries (Retry-After is always honoured)
+      breaker_threshold: Consecutive failed requests that open a host's circuit
+      breaker_cooldown: Seconds a host's circuit stays open
+      metrics: Optional Metrics counting requests, retries and bytes per host
+    """
+
+    def __init__(
+        self,
+        rates=None,
+        default_rate=5.0,
+        retries=5,
+        backoff_factor=0.5,
+        max_backoff=60.0,
+        breaker_threshold=5,
+        breaker_cooldown=60.0,
+        metrics=None,
+    ):
+        self.rates = dict(DEFAULT_RATES, **(rates or {}))
+        self.default_rate = default_rate
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self.buckets = {}
+        self.breakers = {}
+        self.failures = FailureLog()
+        self.metrics = metrics or NULL_METRICS
+        self.n_requests = 0
+        self.n_retries = 0
+        self._lock = threading.Lock()
+
+    def bucket(self, host):
+        with self._lock:
+            if host not in self.buckets:
+                self.buckets[host] = TokenBucket(
+                    self.rates.get(host, self.default_rate)
+                )
+            return self.buckets[host]
+
+    def breaker(self, host):
+        with self._lock:
+            if host not in self.breakers:
+                self.breakers[host] = CircuitBreaker(
+                    self.breaker_threshold, self.breaker_cooldown
+                )
+            return self.breakers[host]
+
+    def session(self, pool_size=10):
+        return ThrottledSession(self, pool_size)
+
+    def backoff(self, attempt):
+        # full jitter, so retrying threads do not hit the host in lockstep
+        return random.uniform(
+            0, min(self.max_backoff, self.backoff_factor * 2**attempt)
+        )
+
+    def count_response(self, host, response, stream):
+        self.metrics.inc("http_requests", host=host, status=response.status_code)
+        length = response.headers.get("Content-Length")
+        if length is not None and length.isdigit():
+            self.metrics.inc("bytes_received", int(length), host=host)
+        elif not stream:
+            self.metrics.inc("bytes_received", len(response.content), host=host)
+
+    def request(self, send, method, url, *args, **kwargs):
+        """
+        Send a request with `send(method, url, ...)` under the host's rate
+        limit, retry policy and circuit breaker.
+        """
+        host = urlsplit(url).hostname
+        breaker = self.breaker(host)
+        if not breaker.allow():
+            self.metrics.inc("circuit_open_rejections", host=host)
+            raise CircuitOpenError(f"Circuit open for {host}, not requesting {url}")
+        bucket = self.bucket(host)
+        retryable = method.upper() in RETRY_METHODS
+        attempt = 0
+        while True:
+            bucket.acquire()
+            self.n_requests += 1
+            try:
+                response = send(method, url, *args, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if not retryable or attempt >= self.retries:
+                    breaker.failure()
+                    raise
+                delay = self.backoff(attempt)
+            else:
+                self.count_response(host, response, kwargs.get("stream", False))
+                if response.status_code not in RETRY_STATUSES:
+                    breaker.success()
+                    bucket.recover()
+                    return response
+                if response.status_code == 429:
+                    bucket.throttle()
+                if not retryable or attempt >= self.retries:
+                    breaker.failure()
+                    return response
+                delay = retry_after(response)
+                if delay is None:
+                    delay = self.backoff(attempt)
+                response.close()
+            attempt += 1
+            self.n_retries += 1
+            self.metrics.inc("http_retries", host=host)
+            time.sleep(delay)
+
+
+_default_session = None
+_default_lock = threading.Lock()
+
+
+def default_session():
+    """
+    Session of a process-wide Transport, used when no session is passed.
+    """
+    global _default_session
+    with _default_lock:
+        if _default_session is None:
+            _default_session = Transport().session()
+        return _default_session
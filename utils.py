@@ -1,18 +1,20 @@
-import openreview
-import csv
-from config import EMAIL, PASSWORD
-import dill
-import requests
 import re
-import html as html_lib
 from urllib.parse import unquote
 import os
+from sink import CSVSink
+from transport import default_session
 
 
-def get_client():
+def get_client(transport=None):
     """
     Returns a tuple of (client_v1, client_v2) for both OpenReview API versions.
+    With a Transport, every request the clients make after logging in goes
+    through its rate limiter, retries and circuit breaker.
     """
+    # imported here so offline use never needs credentials or the client library
+    import openreview
+    from config import EMAIL, PASSWORD
+
     client_v1 = openreview.Client(
         baseurl="https://api.openreview.net", username=EMAIL, password=PASSWORD
     )
@@ -21,6 +23,12 @@ def get_client():
         baseurl="https://api2.openreview.net", username=EMAIL, password=PASSWORD
     )
 
+    if transport is not None:
+        for client in (client_v1, client_v2):
+            session = transport.session()
+            session.cookies.update(client.session.cookies)
+            client.session = session
+
     return client_v1, client_v2
 
 
@@ -33,59 +41,141 @@ def papers_to_list(papers):
     return all_papers
 
 
+class Row(dict):
+    """
+    Extracted paper as written to the CSV, remembering the forum ID it was
+    matched under (fns may rewrite paper.forum) and its BibTeX entry, which
+    are not columns.
+    """
+
+    __slots__ = ("forum", "bibtex")
+
+    def __init__(self, fields, forum=None, bibtex=None):
+        super().__init__(fields)
+        self.forum = forum
+        self.bibtex = bibtex
+
+
 def to_csv(papers_list, fpath):
-    def write_csv():
-        with open(fpath, "a+") as fp:
-            fp.seek(0, 0)  # seek to beginning of file and then read
-            previous_contents = fp.read()
-            writer = csv.DictWriter(fp, fieldnames=field_names)
-            if previous_contents.strip() == "":
-                writer.writeheader()
-            writer.writerows(papers_list)
-
-    if len(papers_list) > 0:
-        field_names = list(
-            papers_list[0].keys()
-        )  # choose one of the papers, get all the keys as they'll be same for rest of them
-        write_csv()
+    """
+    Append papers to the CSV at fpath (gzip if it ends in .gz), adding a header
+    to a new file and widening it if the papers bring new columns.
+    """
+    with CSVSink(fpath) as sink:
+        sink.write_rows(papers_list)
+
+
+def stream_to_csv(papers, fpath, flush_interval=1.0, on_flush=None):
+    """
+    Write papers to the CSV as they are produced, writing out buffered rows
+    at least every `flush_interval` seconds; `on_flush` is called with the
+    number of rows each time some are written.
+    Returns the number of rows written.
+    """
+    with CSVSink(fpath, flush_interval=flush_interval, on_flush=on_flush) as sink:
+        sink.write_rows(papers)
+    return sink.n_rows
 
 
 def save_papers(papers, fpath):
-    with open(fpath, "wb") as fp:
-        dill.dump(papers, fp)
-        print(f"Papers saved at: {fpath}")
+    """
+    Save papers as a columnar snapshot folder (see snapshot.save_snapshot).
+    """
+    from snapshot import save_snapshot
 
+    save_snapshot(papers, fpath)
+    print(f"Papers saved at: {fpath}")
 
-def load_papers(fpath):
-    with open(fpath, "rb") as fp:
-        papers = dill.load(fp)
+
+def load_papers(fpath, venues=None, columns=None):
+    """
+    Load papers saved with `save_papers`, optionally only some venues and columns.
+    Returns a dictionary of papers by group and venue.
+
+    A file pickled by older versions (e.g. papers.pkl) is still loaded, whole
+    notes and all (this needs dill); only `venues` applies to it. Convert it
+    once with `convert_papers` to get a snapshot.
+    """
+    from snapshot import load_snapshot
+
+    if os.path.isfile(fpath):
+        papers = load_pickled_papers(fpath)
+        if venues is not None:
+            papers = {
+                group: {
+                    venue: venue_papers
+                    for venue, venue_papers in grouped_venues.items()
+                    if venue in venues
+                }
+                for group, grouped_venues in papers.items()
+            }
+    else:
+        papers = load_snapshot(fpath, venues=venues, columns=columns)
     print(f"Papers loaded from: {fpath}")
     return papers
 
 
-def fetch_html(forum_id):
+def load_pickled_papers(fpath):
+    """
+    Papers pickled with dill by `save_papers` before snapshots existed.
+    """
+    try:
+        import dill
+    except ImportError:
+        raise ImportError(
+            f"{fpath} was saved by an older version with dill; "
+            "pip install dill to load or convert it"
+        ) from None
+    with open(fpath, "rb") as fp:
+        return dill.load(fp)
+
+
+def convert_papers(pkl_path, fpath):
+    """
+    Convert papers pickled by older versions to a snapshot at fpath.
+    """
+    save_papers(load_pickled_papers(pkl_path), fpath)
+
+
+def report_failure(failures, kind, item, error, **info):
+    """
+    Records a failed fetch in `failures` (a FailureLog), or prints it if there
+    is none.
+    """
+    if failures is None:
+        print(f"Failed to fetch {kind} {item}: {error}")
+    else:
+        failures.record(kind, item, error, **info)
+
+
+def fetch_html(forum_id, session=None, timeout=None, failures=None):
     url = f"https://openreview.net/forum?id={forum_id}&format=bibtex"
     try:
-        response = requests.get(url)
+        response = (session or default_session()).get(url, timeout=timeout)
         if response.status_code == 200:
             return response.text.strip()
         else:
-            print(f"Failed to fetch html for {forum_id}: {response.status_code}")
+            report_failure(
+                failures, "html", forum_id, f"status {response.status_code}", url=url
+            )
             return ""
     except Exception as e:
-        print(f"Error fetching html for {forum_id}: {e}")
+        report_failure(failures, "html", forum_id, e, url=url)
         return ""
 
 
-def fetch_bibtex_from_data_bibtex(forum_id):
+def fetch_bibtex_from_data_bibtex(forum_id, session=None, timeout=None, failures=None):
     """
     Fetches and decodes the BibTeX entry from the `data-bibtex` attribute on the OpenReview forum page.
+    Failures are recorded in `failures`, a FailureLog, if given.
     """
     url = f"https://openreview.net/forum?id={forum_id}"
     try:
-        response = requests.get(url)
+        response = (session or default_session()).get(url, timeout=timeout)
         if response.status_code != 200:
-            print(f"Failed to fetch HTML for {forum_id}: {response.status_code}")
+            report_failure(
+                failures, "bibtex", forum_id, f"status {response.status_code}", url=url
+            )
             return ""
 
         html_text = response.text
@@ -93,7 +183,9 @@ def fetch_bibtex_from_data_bibtex(forum_id):
         # Find data-bibtex="..."
         match = re.search(r'data-bibtex="([^"]+)"', html_text)
         if not match:
-            print(f"No data-bibtex found in HTML for {forum_id}")
+            report_failure(
+                failures, "bibtex", forum_id, "no data-bibtex in the page", url=url
+            )
             return ""
 
         encoded_bibtex = match.group(1)
@@ -102,7 +194,7 @@ def fetch_bibtex_from_data_bibtex(forum_id):
         return decoded_bibtex.strip()
 
     except Exception as e:
-        print(f"Error fetching bibtex for {forum_id}: {e}")
+        report_failure(failures, "bibtex", forum_id, e, url=url)
         return ""
 
 
@@ -161,28 +253,47 @@ def build_bibtex_from_note(note, venue_name="OpenReview"):
         return f"Error: {str(e)}"
 
 
-def download_pdf(pdf_url, dest_folder="pdfs", filename=None):
+def download_pdf(
+    pdf_url,
+    dest_folder="pdfs",
+    filename=None,
+    session=None,
+    timeout=None,
+    failures=None,
+):
     """
     Downloads a PDF from the given URL to the specified folder.
     If filename is not provided, it will use the last part of the URL.
-    Returns the path to the saved PDF.
+    Returns the path to the saved PDF, or None after recording the failure
+    in `failures`, a FailureLog, if given.
     """
-    if not os.path.exists(dest_folder):
-        os.makedirs(dest_folder)
+    os.makedirs(dest_folder, exist_ok=True)
     if filename is None:
         filename = pdf_url.split("/")[-1]
     dest_path = os.path.join(dest_folder, filename)
     try:
-        response = requests.get(pdf_url)
-        if response.status_code == 200:
-            with open(dest_path, "wb") as f:
-                f.write(response.content)
-            return dest_path
-        else:
-            print(f"Failed to download PDF: {pdf_url} (status {response.status_code})")
-            return None
+        with (session or default_session()).get(
+            pdf_url, timeout=timeout, stream=True
+        ) as response:
+            if response.status_code == 200:
+                # stream to a temp file so a failed download never leaves a truncated PDF
+                tmp_path = f"{dest_path}.part"
+                with open(tmp_path, "wb") as f:
+                    for chunk in response.iter_content(chunk_size=1 << 16):
+                        f.write(chunk)
+                os.replace(tmp_path, dest_path)
+                return dest_path
+            else:
+                report_failure(
+                    failures,
+                    "pdf",
+                    filename,
+                    f"status {response.status_code}",
+                    url=pdf_url,
+                )
+                return None
     except Exception as e:
-        print(f"Error downloading PDF {pdf_url}: {e}")
+        report_failure(failures, "pdf", filename, e, url=pdf_url)
         return None
 
 
@@ -193,4 +304,4 @@ def unwrap_value(value):
     """
     if isinstance(value, dict) and "value" in value:
         return value["value"]
-    return value
\ No newline at end of file
+    return value
@@ -1,53 +1,198 @@
-def get_venues(clients, confs, years):
+import json
+import os
+import re
+import time
+from utils import report_failure
+
+TOKEN_RE = re.compile(r"[a-z]+|\d+")
+YEAR_RE = re.compile(r"^\d{4}$")
+
+
+def venue_tokens(text):
+  return TOKEN_RE.findall(text.lower())
+
+
+def parse_venue(venue):
+  """
+  Split a venue ID into conference, year and track.
+  
+  e.g. 'aclweb.org/ACL/2022/Workshop/DialDoc' ->
+  {'id': ..., 'conference': 'aclweb.org/ACL', 'year': '2022', 'track': 'Workshop/DialDoc'}
+  """
+  segments = venue.split('/')
+  for i, segment in enumerate(segments):
+    if YEAR_RE.match(segment):
+      return {
+        'id': venue,
+        'conference': '/'.join(segments[:i]),
+        'year': segment,
+        'track': '/'.join(segments[i + 1:]),
+      }
+  return {'id': venue, 'conference': venue, 'year': None, 'track': ''}
+
+
+class VenueIndex:
+  """
+  Venue IDs indexed by (conference token, year), so looking up a conference
+  and year is a dict hit instead of a scan over every venue.
+  
+  Conferences match whole tokens of the venue ID, so 'ACL' matches
+  'aclweb.org/ACL/2022/Conference' but not 'aclweb.org/NAACL/2022/Conference'.
+  A conference of several tokens ('ICLR.cc') must match consecutive tokens.
+  """
+  def __init__(self, venues):
+    self.venues = list(venues)
+    self.tokens = [venue_tokens(venue) for venue in self.venues]
+    self.index = {}
+    for i, tokens in enumerate(self.tokens):
+      years = [token for token in tokens if YEAR_RE.match(token)]
+      for token in set(tokens):
+        for year in years:
+          self.index.setdefault((token, year), []).append(i)
+  
+  def lookup(self, confs, years):
+    """
+    Venue IDs of any of the conferences in any of the years, in index order.
+    """
+    matches = set()
+    for conf in confs:
+      conf_tokens = venue_tokens(conf)
+      if not conf_tokens:
+        continue
+      n = len(conf_tokens)
+      for year in years:
+        for i in self.index.get((conf_tokens[0], str(year)), []):
+          tokens = self.tokens[i]
+          if n == 1 or any(
+            tokens[j:j + n] == conf_tokens for j in range(len(tokens) - n + 1)
+          ):
+            matches.add(i)
+    return [self.venues[i] for i in sorted(matches)]
+
+
+def fetch_venue_lists(clients, failures=None):
+  """
+  Get the venues of API v1 and API v2 as two lists, None for a listing that
+  cannot be fetched (it is recorded in failures, a FailureLog).
+  """
+  venue_lists = []
+  for api_version, client in enumerate(clients, start=1):
+    try:
+      venue_lists.append(client.get_group(id='venues').members)
+    except Exception as e:
+      report_failure(failures, 'group', 'venues', e, api_version=api_version)
+      venue_lists.append(None)
+  return venue_lists
+
+
+def merge_venues(venue_lists):
+  return sorted(set(venue for venues in venue_lists if venues for venue in venues))
+
+
+def fetch_venues(clients, failures=None):
   """
   Get venues from both API v1 and API v2 clients and merge the results.
+  A listing that cannot be fetched is recorded in failures (a FailureLog).
+  """
+  return merge_venues(fetch_venue_lists(clients, failures))
+
+
+class VenueDirectory:
+  """
+  Venue list of both APIs cached in a JSON file and parsed once into a
+  VenueIndex. While the file is younger than ttl no request is made. The
+  list is only cached when both listings were fetched.
+  
+  Args:
+    path: JSON file the directory is cached in
+    ttl: Seconds after which the directory is fetched again, None to never expire
+  """
+  def __init__(self, path='.cache/venues.json', ttl=24 * 60 * 60):
+    self.path = path
+    self.ttl = ttl
+    self.entries = None
+    self.index = None
+  
+  def _read(self):
+    try:
+      with open(self.path) as fp:
+        data = json.load(fp)
+    except (OSError, ValueError):
+      return None
+    if self.ttl is not None and time.time() - data.get('fetched_at', 0) > self.ttl:
+      return None
+    return data['venues']
+  
+  def _write(self, entries):
+    os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+    tmp_path = f"{self.path}.tmp"
+    with open(tmp_path, 'w') as fp:
+      json.dump({'fetched_at': time.time(), 'venues': entries}, fp)
+    os.replace(tmp_path, self.path)
+  
+  def load(self, clients, failures=None):
+    if self.index is not None:
+      return self
+    entries = self._read()
+    if entries is None:
+      venue_lists = fetch_venue_lists(clients, failures)
+      entries = [parse_venue(venue) for venue in merge_venues(venue_lists)]
+      # without one of the listings the list is partial; use it for this run
+      # but do not cache it, or its venues would be missing for the whole ttl
+      if None not in venue_lists:
+        self._write(entries)
+    self.entries = entries
+    self.index = VenueIndex(entry['id'] for entry in entries)
+    return self
+  
+  def refresh(self, clients, failures=None):
+    """
+    Fetch the directory again regardless of its age.
+    """
+    try:
+      os.remove(self.path)
+    except OSError:
+      pass
+    self.index = None
+    return self.load(clients, failures)
+  
+  def lookup(self, confs, years):
+    return self.index.lookup(confs, years)
+
+
+def get_venues(clients, confs, years, directory=None, failures=None):
+  """
+  Get the venue IDs of the conferences and years.
   
   Args:
     clients: Tuple of (client_v1, client_v2)
     confs: List of conference names
     years: List of years
+    directory: Optional VenueDirectory caching the venue list between runs;
+      without it both APIs are queried
+    failures: Optional FailureLog recording the listings that could not be fetched
     
   Returns:
     List of venue IDs
   """
-  client_v1, client_v2 = clients
-  
-  def filter_year(venue):
-    if venue is None:
-      return None
-    for year in years:
-      if year in venue:
-        return venue
-    return None
-  
-  # Get venues from API v1
-  venues_v1 = []
-  try:
-    venues_v1 = client_v1.get_group(id='venues').members
-  except Exception as e:
-    print(f"Error getting venues from API v1: {e}")
-  
-  # Get venues from API v2
-  venues_v2 = []
-  try:
-    venues_v2 = client_v2.get_group(id='venues').members
-  except Exception as e:
-    print(f"Error getting venues from API v2: {e}")
-  
-  # Merge venues from both APIs
-  venues = list(set(venues_v1 + venues_v2))
+  if directory is not None:
+    return directory.load(clients, failures).lookup(confs, years)
+  return filter_venues(fetch_venues(clients, failures), confs, years)
+
+
+def filter_venues(venues, confs, years):
+  """
+  Keep the venue IDs that belong to one of the conferences and years.
   
-  venues = list(map(filter_year, venues))
-  venues = filter(lambda venue: venue is not None, venues)
-  reqd_venues = []
-  for venue in venues:
-    for conf in confs:
-      if conf.lower() in venue.lower():
-        reqd_venues.append(venue)
-        break
-  reqd_venues = map(filter_year, reqd_venues)
-  reqd_venues = list(filter(lambda venue: venue is not None, reqd_venues))
-  return reqd_venues
+  Args:
+    venues: List of venue IDs
+    confs: List of conference names
+    years: List of years
+    
+  Returns:
+    List of venue IDs
+  """
+  return VenueIndex(venues).lookup(confs, years)
 
 
 def group_venues(venues, bins):